@@ -3,52 +3,87 @@ from moleculeClass import Molecule
 from tokenizer import*
 import copy
 from helperFunctions import*
+from symmetry import bondClasses, compactBondClasses, repeated
+from canonicalForm import VisitedStates, moleculeGraph, compactGraph
 import random
+from collections import Counter
 
-def getSkeletalStructuresDFS(molecule,moleculeList=None,visited=None):
+def getSkeletalStructuresDFS(molecule,moleculeList=None,visited=None,
+                             budget=None,stats=None):
     """gets all skeletal structures using a DFS algorithm"""
+    if moleculeList is None:
+        moleculeList=[]
+    for _ in iterSkeletalStructuresDFS(molecule,moleculeList,visited,budget,
+                                       stats):
+        pass
+    return moleculeList
+
+def iterSkeletalStructuresDFS(molecule,moleculeList=None,visited=None,
+                              budget=None,stats=None):
+    """same search as getSkeletalStructuresDFS, but yields each skeletal
+    structure as soon as it's found"""
     if moleculeList is None:
         moleculeList=[]
     if visited is None:
-        visited=set()
-    strMol=molecule.molToStr()
-    if strMol in visited:
-        return moleculeList
-    visited.add(strMol)
+        visited=VisitedStates()
+    #out of budget, only keep looking while nothing has been found
+    if (budget is not None and not budget.spend() and 
+        budget.shouldStop(moleculeList)):
+        return
+    if stats is not None:
+        stats.count("dfs.nodes")
+    if not visited.visit(moleculeGraph(molecule)):
+        if stats is not None:
+            stats.count("dfs.visitedHits")
+        return
     if molecule.bondElectrons/2>=molecule.numAtoms-1:
        isAllBondedOrCircular=molecule.isBondedOrCircular()
     else:
         isAllBondedOrCircular=(False,False)
     #if it detects a cyclic molecule
     if isAllBondedOrCircular[1]:
-        return moleculeList
+        if stats is not None:
+            stats.count("dfs.prune.ring")
+        return
     #the whole structure must be connected to be considered complete
     if isAllBondedOrCircular[0]:
         if not (badCarbon(molecule) and moleculeList):
              clone=molecule.cloneMolecule()
              clone.bondElectrons=molecule.currentElectrons
              moleculeList.append(clone)
-        return moleculeList
+             if stats is not None:
+                 stats.count("dfs.skeletons")
+             yield clone
+        elif stats is not None:
+            stats.count("dfs.prune.badCarbon")
+        return
     for index in range(molecule.numAtoms-1):
+        if budget is not None and budget.shouldStop(moleculeList):
+            break
         atomOne=molecule.atoms[index]
         if (atomOne.electronDomains and moleculeList and 
             checkOverBonding(atomOne)):
+            if stats is not None:
+                stats.count("dfs.prune.overBonding")
             continue
         for index1 in range(index+1,molecule.numAtoms):
+            if budget is not None and budget.shouldStop(moleculeList):
+                break
             atomTwo=molecule.atoms[index1]
             if (atomTwo.electronDomains and moleculeList
                  and checkOverBonding(atomTwo)):
+                if stats is not None:
+                    stats.count("dfs.prune.overBonding")
                 continue
 
-            oldStrOne=atomOne.strAtom
-            oldStrTwo=atomTwo.strAtom
-
             newBond=atomOne.sigmaBond(atomTwo)
             molecule.bondElectrons+=2
 
 
             #don't continue if bond unsuccesful
             if not newBond:
+                if stats is not None:
+                    stats.count("dfs.prune.cantBond")
                 continue
             else:
                molecule.currentElectrons+=2
@@ -58,50 +93,81 @@ def getSkeletalStructuresDFS(molecule,moleculeList=None,visited=None):
                 moleculeList):
                atomOne.unBond(atomTwo,newBond)
                molecule.currentElectrons-=2
-               atomOne.strAtom=oldStrOne
-               atomTwo.strAtom=oldStrTwo
+               if stats is not None:
+                   stats.count("dfs.prune.peroxide")
                continue
 
             #Both atoms not having an over octet means its valid
             if (newBond and atomOne.hasOctet()!=False 
                 and atomTwo.hasOctet()!=False):
-               atomOne.strAtom=atomOne.atomToStr()
-               atomTwo.strAtom=atomTwo.atomToStr()
-               getSkeletalStructuresDFS(molecule,moleculeList,visited)
+               #bonds are only ever added, so nothing under a ring is a
+               #skeleton
+               if not molecule.hasRing(atomOne):
+                   yield from iterSkeletalStructuresDFS(molecule,
+                                moleculeList,visited,budget,stats)
+               elif stats is not None:
+                   stats.count("dfs.prune.ring")
+            elif stats is not None:
+                stats.count("dfs.prune.octet")
 
             if newBond:
                atomOne.unBond(atomTwo,newBond)
                molecule.currentElectrons-=2
                molecule.bondElectrons-=2
-               atomOne.strAtom=oldStrOne
-               atomTwo.strAtom=oldStrTwo
 
-               
-    return moleculeList
+
 
     
 
 def backtrackPiBondsLonePairs(structure,moleculeList,bondList,
-                                minScore,visited):
+                                minScore,visited,budget=None,stats=None):
     """given a skeletal structure, returns a list of complete molecules"""
     if structure.expandedOctet:
         return []
+    for _ in iterPiBondsLonePairs(structure,moleculeList,bondList,minScore,
+                                  visited,budget,stats):
+        pass
+    return (moleculeList,minScore)
+
+def iterPiBondsLonePairs(structure,moleculeList,bondList,minScore,visited,
+                         budget=None,stats=None,symmetric=None):
+    """same search as backtrackPiBondsLonePairs, but yields each complete
+    molecule as soon as it's found.
+
+    bonds a symmetry of the structure swaps give the same structures, so
+    only the first of them is tried. a symmetry of a structure is one of
+    its skeleton too, so symmetric (bond -> its class in the skeleton, None
+    when they're all different) says where there can be any"""
+    if structure.expandedOctet:
+        return
+    if (budget is not None and not budget.spend() and 
+        budget.shouldStop(moleculeList or minScore[0]!=float('inf'))):
+        return
+    if stats is not None:
+        stats.count("backtrack.nodes")
     if bondList is None:
         bondList=structure.getBondListNoH()
+        classes=bondClasses(structure,bondList)
+        if repeated(classes):
+            symmetric=dict(zip(bondList,classes))
 
     #there can only be 1 perfect structure, so if there is, stop the search
     if minScore[0]==0 and moleculeList:
-        return (moleculeList,minScore)
+        if stats is not None:
+            stats.count("backtrack.prune.perfect")
+        return
     
     lowestScore=minScore[0]
     currentScore=structure.formalChargeSum
     if currentScore>lowestScore:
-        return (moleculeList,minScore)
+        if stats is not None:
+            stats.count("backtrack.prune.formalCharge")
+        return
     
-    strMol=structure.molToStr()
-    if strMol in visited:
-        return (moleculeList,minScore)
-    visited.add(strMol)
+    if not visited.visit(moleculeGraph(structure)):
+        if stats is not None:
+            stats.count("backtrack.visitedHits")
+        return
     idealElectrons=structure.idealBondElectrons
     #if the structure has the ideal amount of bond electrons, 
     #it moves to lone pairs
@@ -111,30 +177,38 @@ def backtrackPiBondsLonePairs(structure,moleculeList,bondList,
         #this means that the score was too high while adding lone pairs
         if not addedLonePairs or (structure.formalChargeSum>lowestScore):
             #reverts to previous formal charge sum
-            return (moleculeList,minScore)
+            if stats is not None:
+                stats.count("backtrack.prune.lonePairCharge")
+            return
         else:
             formalChargeSum=structure.formalChargeSum
             if formalChargeSum<=lowestScore:
                 minScore[0]=formalChargeSum
                 if addedLonePairs:
-                    moleculeList.append(structure.cloneMolecule())
+                    clone=structure.cloneMolecule()
+                    moleculeList.append(clone)
+                    if stats is not None:
+                        stats.count("backtrack.structures")
+                    yield clone
             structure.removeAllLonePairs()
             #we need to revert the formal Charge Sum back
             structure.formalChargeSum=currentScore
-            return (moleculeList,minScore)
+            return
     
     octetDict=structure.octetDict
-    for bond in sorted(bondList, key=lambda b:(b.numModifications,
-                        -1*min(b.atomOne.prefBonds,b.atomTwo.prefBonds))):
-        if bond.type=="≡":
-            continue
-
+    candidates=[bond for bond in sorted(bondList, key=lambda b:(
+                    b.numModifications,
+                    -1*min(b.atomOne.prefBonds,b.atomTwo.prefBonds)))
+                if bond.type!="≡" and not octetDict[bond.atomOne] and
+                not octetDict[bond.atomTwo] and bond.atomOne.symbol!="H"]
+    candidates=withoutSymmetric(candidates,symmetric,
+        lambda bonds: bondClasses(structure,bonds),stats)
+    for bond in candidates:
+        if budget is not None and budget.shouldStop(
+                            moleculeList or minScore[0]!=float('inf')):
+            break
         atomOne=bond.atomOne
         atomTwo=bond.atomTwo
-        if octetDict[atomOne] or octetDict[atomTwo] or atomOne.symbol in {"H"}:
-            continue
-        oldStrOne=atomOne.strAtom
-        oldStrTwo=atomTwo.strAtom
 
         bond.addPi()
         structure.bondElectrons+=2
@@ -152,12 +226,10 @@ def backtrackPiBondsLonePairs(structure,moleculeList,bondList,
             octetDict[atomTwo]=True
             formalChargeTwo=abs(atomTwo.getFormalCharge())
             structure.formalChargeSum+=formalChargeTwo
-        
-        atomOne.strAtom=atomOne.atomToStr()
-        atomTwo.strAtom=atomTwo.atomToStr()
 
-        backtrackPiBondsLonePairs(structure,moleculeList,bondList,
-                                  minScore,visited)
+        yield from iterPiBondsLonePairs(structure,moleculeList,bondList,
+                                        minScore,visited,budget,stats,
+                                        symmetric)
         if hasOctetOne:
             octetDict[atomOne]=False
             structure.formalChargeSum-=formalChargeOne
@@ -167,13 +239,37 @@ def backtrackPiBondsLonePairs(structure,moleculeList,bondList,
             structure.formalChargeSum-=formalChargeTwo
         
         bond.removePi()
-        atomOne.strAtom=oldStrOne
-        atomTwo.strAtom=oldStrTwo
         structure.bondElectrons-=2
         structure.currentElectrons-=2
-    return (moleculeList,minScore)
 
 
+def withoutSymmetric(bonds,symmetric,classesOf,stats=None):
+    """bonds without the ones a symmetry maps onto an earlier one, those
+    would only lead to structures the earlier one already found. only
+    bonds sharing a class in the skeleton (symmetric) can be, so
+    classesOf is only asked about those"""
+    if symmetric is None:
+        return bonds
+    skeletonClasses=[symmetric[bond] for bond in bonds]
+    if not repeated(skeletonClasses):
+        return bonds
+    counts=Counter(skeletonClasses)
+    suspects=[bond for bond,bondClass in zip(bonds,skeletonClasses)
+              if counts[bondClass]>1]
+    classes=dict(zip(suspects,classesOf(suspects)))
+    seen=set()
+    kept=[]
+    for bond in bonds:
+        bondClass=classes.get(bond)
+        if bondClass is not None:
+            if bondClass in seen:
+                if stats is not None:
+                    stats.count("backtrack.prune.symmetry")
+                continue
+            seen.add(bondClass)
+        kept.append(bond)
+    return kept
+
 def addLonePairs(structure,minScore): #takes in minscore for pruning
     """adds lone pairs on every atom of a molecule until its complete."""
     prevFormalChargeSum=structure.formalChargeSum
@@ -198,6 +294,194 @@ def addLonePairs(structure,minScore): #takes in minscore for pruning
 
 
 
+#the same two searches on CompactMolecule states, see compactMolecule.py
+
+def iterCompactSkeletons(state,found=None,visited=None,budget=None,
+                         stats=None):
+    """iterSkeletalStructuresDFS on a CompactMolecule, yields a snapshot of
+    every skeletal structure"""
+    if found is None:
+        found=[]
+    if visited is None:
+        visited=VisitedStates()
+    if (budget is not None and not budget.spend() and 
+        budget.shouldStop(found)):
+        return
+    if stats is not None:
+        stats.count("dfs.nodes")
+    if not visited.visit(compactGraph(state)):
+        if stats is not None:
+            stats.count("dfs.visitedHits")
+        return
+    numAtoms=state.numAtoms
+    if state.bondElectrons/2>=numAtoms-1:
+        isAllBondedOrCircular=state.isBondedOrCircular()
+    else:
+        isAllBondedOrCircular=(False,False)
+    if isAllBondedOrCircular[1]:
+        if stats is not None:
+            stats.count("dfs.prune.ring")
+        return
+    if isAllBondedOrCircular[0]:
+        if not (state.hasBadCarbon() and found):
+            skeleton=state.snapshot()
+            found.append(skeleton)
+            if stats is not None:
+                stats.count("dfs.skeletons")
+            yield skeleton
+        elif stats is not None:
+            stats.count("dfs.prune.badCarbon")
+        return
+    neighbors=state.neighbors
+    symbols=state.symbols
+    for atomOne in range(numAtoms-1):
+        if budget is not None and budget.shouldStop(found):
+            break
+        if neighbors[atomOne] and found and state.isOverBonded(atomOne):
+            if stats is not None:
+                stats.count("dfs.prune.overBonding")
+            continue
+        for atomTwo in range(atomOne+1,numAtoms):
+            if budget is not None and budget.shouldStop(found):
+                break
+            if neighbors[atomTwo] and found and state.isOverBonded(atomTwo):
+                if stats is not None:
+                    stats.count("dfs.prune.overBonding")
+                continue
+            #counted even when the bond fails, like the DFS above does
+            state.bondElectrons+=2
+            if not state.sigmaBond(atomOne,atomTwo):
+                if stats is not None:
+                    stats.count("dfs.prune.cantBond")
+                continue
+            state.currentElectrons+=2
+            #eliminates peroxides if applicable
+            if symbols[atomOne]=="O" and symbols[atomTwo]=="O" and found:
+                state.unBond(atomOne,atomTwo)
+                state.currentElectrons-=2
+                if stats is not None:
+                    stats.count("dfs.prune.peroxide")
+                continue
+            if (state.hasOctet(atomOne)!=False and 
+                state.hasOctet(atomTwo)!=False):
+                if not state.hasRing(atomOne):
+                    yield from iterCompactSkeletons(state,found,visited,
+                                                    budget,stats)
+                elif stats is not None:
+                    stats.count("dfs.prune.ring")
+            elif stats is not None:
+                stats.count("dfs.prune.octet")
+            state.unBond(atomOne,atomTwo)
+            state.currentElectrons-=2
+            state.bondElectrons-=2
+
+def iterCompactPiBonds(state,found,bondList,minScore,visited,budget=None,
+                       stats=None,symmetric=None):
+    """iterPiBondsLonePairs on a CompactMolecule skeleton, yields a
+    snapshot of every complete structure"""
+    if (budget is not None and not budget.spend() and 
+        budget.shouldStop(found or minScore[0]!=float('inf'))):
+        return
+    if stats is not None:
+        stats.count("backtrack.nodes")
+    if bondList is None:
+        bondList=state.getBondListNoH()
+        classes=compactBondClasses(state,bondList)
+        if repeated(classes):
+            symmetric=dict(zip(bondList,classes))
+    if minScore[0]==0 and found:
+        if stats is not None:
+            stats.count("backtrack.prune.perfect")
+        return
+    lowestScore=minScore[0]
+    currentScore=state.formalChargeSum
+    if currentScore>lowestScore:
+        if stats is not None:
+            stats.count("backtrack.prune.formalCharge")
+        return
+    if not visited.visit(compactGraph(state)):
+        if stats is not None:
+            stats.count("backtrack.visitedHits")
+        return
+    if state.bondElectrons==state.idealBondElectrons:
+        if not addCompactLonePairs(state,minScore[0]):
+            if stats is not None:
+                stats.count("backtrack.prune.lonePairCharge")
+            return
+        formalChargeSum=state.formalChargeSum
+        if formalChargeSum<=lowestScore:
+            minScore[0]=formalChargeSum
+            structure=state.copy()
+            found.append(structure)
+            if stats is not None:
+                stats.count("backtrack.structures")
+            yield structure
+        state.removeAllLonePairs()
+        state.formalChargeSum=currentScore
+        return
+
+    octet=state.octet
+    order=state.order
+    numAtoms=state.numAtoms
+    prefBonds=state.prefBonds
+    symbols=state.symbols
+    candidates=[bond for bond in sorted(bondList, key=lambda b:(
+                    order[b[0]*numAtoms+b[1]]-1,
+                    -1*min(prefBonds[b[0]],prefBonds[b[1]])))
+                if order[bond[0]*numAtoms+bond[1]]!=3 and
+                not octet[bond[0]] and not octet[bond[1]] and
+                symbols[bond[0]]!="H"]
+    candidates=withoutSymmetric(candidates,symmetric,
+        lambda bonds: compactBondClasses(state,bonds),stats)
+    for atomOne,atomTwo in candidates:
+        if budget is not None and budget.shouldStop(
+                            found or minScore[0]!=float('inf')):
+            break
+
+        state.addPi(atomOne,atomTwo)
+        state.bondElectrons+=2
+        state.currentElectrons+=2
+
+        hasOctetOne=state.hasOctet(atomOne)
+        hasOctetTwo=state.hasOctet(atomTwo)
+        if hasOctetOne:
+            octet[atomOne]=True
+            formalChargeOne=abs(state.getFormalCharge(atomOne))
+            state.formalChargeSum+=formalChargeOne
+        if hasOctetTwo:
+            octet[atomTwo]=True
+            formalChargeTwo=abs(state.getFormalCharge(atomTwo))
+            state.formalChargeSum+=formalChargeTwo
+
+        yield from iterCompactPiBonds(state,found,bondList,minScore,
+                                      visited,budget,stats,symmetric)
+        if hasOctetOne:
+            octet[atomOne]=False
+            state.formalChargeSum-=formalChargeOne
+        if hasOctetTwo:
+            octet[atomTwo]=False
+            state.formalChargeSum-=formalChargeTwo
+
+        state.removePi(atomOne,atomTwo)
+        state.bondElectrons-=2
+        state.currentElectrons-=2
+
+def addCompactLonePairs(state,minScore):
+    """addLonePairs on a CompactMolecule"""
+    prevFormalChargeSum=state.formalChargeSum
+    octet=state.octet
+    for atom in range(state.numAtoms):
+        if state.symbols[atom] in {"H","B","Al","Be"} or octet[atom]:
+            continue
+        state.addUntilOctet(atom)
+        state.formalChargeSum+=abs(state.getFormalCharge(atom))
+        if state.formalChargeSum>minScore:
+            state.formalChargeSum=prevFormalChargeSum
+            state.removeAllLonePairs()
+            return False
+    return True
+
+
 #The following algorithms don't work as efficiently as this one
 
 def backtrackSkeletalStructure(structure,moleculeList,bondList,atomList,
@@ -0,0 +1,174 @@
+"""benchmarks getBestStructures over the commonNames table and a graded set
+of bigger formulas, writing the results as json.
+
+    python benchmark.py --out before.json
+    python benchmark.py --out after.json --compare before.json
+
+every molecule gets a time budget (--max-seconds), so the big ones finish
+as truncated instead of running for hours"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import moleculeSolver
+from moleculeClass import Molecule
+from searchBudget import SearchBudget
+from searchStats import SearchStats
+from tokenizer import commonNames, parseMolecule
+
+
+def formula(*parts):
+    """formula("C",2,"H",6) is C2H6, counts of 1 are left out"""
+    text=""
+    for index in range(0,len(parts),2):
+        count=parts[index+1]
+        if count:
+            text+=parts[index]+(str(count) if count>1 else "")
+    return text
+
+def syntheticFormulas():
+    """alkanes CnH2n+2, CnH2nOm and ions, roughly from small to large"""
+    names=[formula("C",n,"H",2*n+2) for n in range(1,7)]
+    names+=[formula("C",n,"H",2*n,"O",m) for n in range(1,5)
+            for m in range(1,3)]
+    names+=["OH^-","H3O^+","CN^-","NH4^+","NO2^-","NO3^-","HCO3^-",
+            "CO3^2-","SO4^2-","PO4^3-"]
+    return names
+
+def corpus():
+    return list(commonNames)+syntheticFormulas()
+
+
+class CloneCounter:
+    """counts cloneMolecule calls by wrapping it in place"""
+
+    def __init__(self):
+        self.clones=0
+        original=Molecule.cloneMolecule
+        def counted(molecule):
+            self.clones+=1
+            return original(molecule)
+        Molecule.cloneMolecule=counted
+
+
+def runOne(name,maxSeconds,compact,trees,measureMemory,cloneCounter):
+    result={"atoms":None,"seconds":None,"peakBytes":None}
+    try:
+        result["atoms"]=parseMolecule(name).numAtoms
+    except Exception as error:
+        result["error"]=repr(error)
+        return result
+    cloneCounter.clones=0
+    budget=SearchBudget(maxSeconds)
+    stats=SearchStats()
+    start=time.perf_counter()
+    structures=moleculeSolver.getBestStructures(name,budget,compact=compact,
+                                                stats=stats,trees=trees)
+    result["seconds"]=round(time.perf_counter()-start,4)
+    #with --trees the skeletons come from the tree generator, which only
+    #falls back to the DFS when it finds nothing
+    result["skeletonStates"]=(stats.counts["tree.nodes"]+
+                              stats.counts["dfs.nodes"])
+    result["backtrackStates"]=stats.counts["backtrack.nodes"]
+    result["clones"]=cloneCounter.clones
+    result["structures"]=len(structures)
+    result["bestScore"]=structures[0].getScore() if structures else None
+    result["truncated"]=budget.truncated
+    result["stats"]=stats.stats()
+    if measureMemory:
+        #a second run, tracemalloc slows everything down too much to time
+        tracemalloc.start()
+        moleculeSolver.getBestStructures(name,SearchBudget(maxSeconds),
+                                         compact=compact,trees=trees)
+        result["peakBytes"]=tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def gitCommit():
+    try:
+        return subprocess.run(["git","rev-parse","--short","HEAD"],
+                              capture_output=True,text=True,
+                              check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def statesOf(result):
+    """skeleton and backtrack states of a result. results from before
+    skeletonStates only counted the DFS, as dfsStates"""
+    skeletonStates=result.get("skeletonStates",result.get("dfsStates",0))
+    return skeletonStates+result["backtrackStates"]
+
+def compare(old,new,threshold):
+    """prints what changed between two runs, returns the molecules that got
+    slower by more than threshold or visit more states"""
+    regressions=[]
+    print(f"{'molecule':<22}{'old s':>10}{'new s':>10}{'ratio':>8}"
+          f"{'states':>14}")
+    for name,result in new["results"].items():
+        before=old["results"].get(name)
+        if not before or before.get("seconds") is None or (
+            result.get("seconds") is None):
+            continue
+        ratio=result["seconds"]/max(before["seconds"],1e-4)
+        oldStates=statesOf(before)
+        newStates=statesOf(result)
+        flag=""
+        #states only mean something when neither run was cut short
+        if ratio>threshold or (newStates>oldStates and
+                               not (before["truncated"] or
+                                    result["truncated"])):
+            flag=" <-"
+            regressions.append(name)
+        print(f"{name:<22}{before['seconds']:>10.3f}"
+              f"{result['seconds']:>10.3f}{ratio:>8.2f}"
+              f"{newStates-oldStates:>+14d}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out",default="benchmark.json")
+    parser.add_argument("--max-seconds",type=float,default=60.0,
+                        help="search budget per molecule")
+    parser.add_argument("--only",help="comma separated molecules to run")
+    parser.add_argument("--compact",action="store_true",
+                        help="use the CompactMolecule engine")
+    parser.add_argument("--trees",action="store_true",
+                        help="get skeletons from iterTreeSkeletons")
+    parser.add_argument("--no-memory",action="store_true",
+                        help="skip the tracemalloc run")
+    parser.add_argument("--compare",help="earlier results to compare with")
+    parser.add_argument("--threshold",type=float,default=1.2,
+                        help="slowdown ratio --compare calls a regression")
+    args=parser.parse_args(argv)
+
+    names=args.only.split(",") if args.only else corpus()
+    cloneCounter=CloneCounter()
+    results={}
+    for name in names:
+        results[name]=runOne(name,args.max_seconds,args.compact,args.trees,
+                             not args.no_memory,cloneCounter)
+        print(name,results[name],file=sys.stderr)
+    report={"meta":{"commit":gitCommit(),"python":platform.python_version(),
+                    "platform":platform.platform(),"time":time.time(),
+                    "maxSeconds":args.max_seconds,"compact":args.compact,
+                    "trees":args.trees},
+            "results":results}
+    with open(args.out,"w") as file:
+        json.dump(report,file,indent=4)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions=compare(json.load(file),report,args.threshold)
+        if regressions:
+            print("regressions:",", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
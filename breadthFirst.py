@@ -4,18 +4,21 @@ from moleculeClass import Molecule
 import copy
 from tokenizer import*
 from helperFunctions import*
+from canonicalForm import VisitedStates, moleculeGraph
 
-def getSkeletalStructuresBFS(molecule):
+def getSkeletalStructuresBFS(molecule,stats=None):
     #returns a list of all single bonded molecules
     moleculeList=[]
-    visited=set()
+    visited=VisitedStates()
     queue=deque()
     queue.append(molecule)
-    visited.add(molecule.molToStr())
+    visited.visit(moleculeGraph(molecule))
     while queue:
        # print(len(moleculeList))
         current=queue.popleft()
       #  prettyPrint(current)
+        if stats is not None:
+            stats.count("bfs.nodes")
         length=len(current.atoms)
         for index in range(length-1):
             for index1 in range(index+1,length):
@@ -26,16 +29,18 @@ def getSkeletalStructuresBFS(molecule):
                 if not canBond:
                     continue
 
-                strMol=copyMol.molToStr()
-                if strMol in visited:
-                   continue
-                visited.add(strMol)
+                if not visited.visit(moleculeGraph(copyMol)):
+                    if stats is not None:
+                        stats.count("bfs.visitedHits")
+                    continue
                 #if oxygen has 3 single bonds
                 #or nitrogren has 4 single bonds
                 #or halogen has over 1 bond
                 #abandon it if theres an alternative
                 if (hasOverOxyNitro(copyMol) or
                      badHalogen(copyMol)) and len(moleculeList)>=1:
+                        if stats is not None:
+                            stats.count("bfs.prune.overBonding")
                         continue
                 isBondedOrCircular=copyMol.isBondedOrCircular()
                 #if all atoms are bonded and its not circular
@@ -43,6 +48,8 @@ def getSkeletalStructuresBFS(molecule):
                     and copyMol.isValid()):
                     #checks for carbons with 1 bond
                     if badCarbon(copyMol) and len(moleculeList)>=1:
+                        if stats is not None:
+                            stats.count("bfs.prune.badCarbon")
                         continue
                     moleculeList.append(copyMol.cloneMolecule())
                     continue
@@ -50,7 +57,7 @@ def getSkeletalStructuresBFS(molecule):
                     queue.append(copyMol)
     return moleculeList
 
-def bfsSkeletalStructure(structure,minScore=None):
+def bfsSkeletalStructure(structure,minScore=None,stats=None):
     moleculeList=[]
     #if it's complete return
     if minScore is None:
@@ -60,18 +67,21 @@ def bfsSkeletalStructure(structure,minScore=None):
         return (moleculeList,minScore)
     queue=deque()
     queue.append(structure.cloneMolecule())
-    visited=set()
+    visited=VisitedStates()
     while queue:
         current=queue.popleft()
+        if stats is not None:
+            stats.count("bfs.nodes")
     
         score=current.getScore()
         if score>minScore:
+            if stats is not None:
+                stats.count("bfs.prune.score")
             continue
-        strMol=current.molToStr()
-        if strMol in visited:
-            print(strMol)
+        if not visited.visit(moleculeGraph(current)):
+            if stats is not None:
+                stats.count("bfs.visitedHits")
             continue
-        visited.add(strMol)
         if current.isComplete():
            moleculeList.append(current.cloneMolecule())
            score=current.getScore()
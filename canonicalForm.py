@@ -0,0 +1,209 @@
+"""canonical forms of molecular graphs, the visited keys of the
+backtrackers. a hash of the graph would be smaller, but two different
+graphs can share one, and a search keyed on it skips states it never saw.
+
+the states are mostly forests: the pi bond searches work on trees and the
+skeleton searches give up on a state once it has a ring. a forest's
+canonical form is the sorted codes of its pieces, each piece rooted at its
+center (or central bond) and coded bottom up like symmetry.py does (AHU),
+with ids interned per search. a piece with a ring gets the smallest
+labelled graph over every way colour refinement leaves open of numbering
+its atoms. either way two states get the same code exactly when they're
+the same graph up to relabelling, and a search only keeps the integer
+codes. plain hydrogens are only ever leaves, so they're counted in the
+label of the atom they're on, which keeps the graphs small"""
+
+
+def refine(colors,neighbors,ids):
+    """colour refinement, recolours every atom by its colour and its
+    neighbors' until no colour splits"""
+    numColors=len(set(colors))
+    while True:
+        colors=[ids.setdefault((colors[atom],tuple(sorted(
+            (bond,colors[other]) for other,bond in neighbors[atom]))),len(ids))
+                for atom in range(len(colors))]
+        count=len(set(colors))
+        if count==numColors:
+            return colors
+        numColors=count
+
+def ringCode(labels,neighbors,ids,colors=None):
+    """the smallest (colours, bonds) numbering of a graph with its atoms in
+    colour order, over every way of picking an atom out of a colour that's
+    still shared, refining again after each pick"""
+    if colors is None:
+        colors=[ids.setdefault(label,len(ids)) for label in labels]
+    colors=refine(colors,neighbors,ids)
+    counts={}
+    for color in colors:
+        counts[color]=counts.get(color,0)+1
+    tied=[color for color,count in counts.items() if count>1]
+    if tied:
+        color=min(tied)
+        best=None
+        for atom in range(len(colors)):
+            if colors[atom]!=color:
+                continue
+            picked=colors[:]
+            picked[atom]=ids.setdefault(("pick",color),len(ids))
+            code=ringCode(labels,neighbors,ids,picked)
+            if best is None or code<best:
+                best=code
+        return best
+    rank={atom:place for place,atom in
+          enumerate(sorted(range(len(colors)),key=colors.__getitem__))}
+    return (tuple(sorted(colors)),tuple(sorted(
+        (min(rank[atom],rank[other]),max(rank[atom],rank[other]),bond)
+        for atom in range(len(colors)) for other,bond in neighbors[atom]
+        if atom<other)))
+
+def canonicalCode(labels,neighbors,loose,ids):
+    """canonical id of the graph, the same for two graphs exactly when
+    they're isomorphic with the same labels. labels[atom] is any hashable
+    label, neighbors[atom] the (other atom, bond label) pairs, loose the
+    labels of atoms left out because they have no bonds and ids the
+    interning dict, shared by every state of a search.
+
+    leaves are peeled off a layer at a time, each atom coded from the
+    atoms peeled before it, so a tree's last atom (or bond) is its center
+    and its code covers the whole tree. what's left is in a ring"""
+    numAtoms=len(labels)
+    remaining=[len(bonded) for bonded in neighbors]
+    level=[-1]*numAtoms
+    code=[0]*numAtoms
+    codes=[]
+    layer=[atom for atom in range(numAtoms) if remaining[atom]<=1]
+    depth=0
+    while layer:
+        for atom in layer:
+            level[atom]=depth
+        for atom in layer:
+            code[atom]=ids.setdefault((labels[atom],tuple(sorted(
+                (bond,code[other]) for other,bond in neighbors[atom]
+                if 0<=level[other]<depth))),len(ids))
+        nextLayer=[]
+        for atom in layer:
+            for other,bond in neighbors[atom]:
+                if level[other]<0:
+                    remaining[other]-=1
+                    if remaining[other]==1:
+                        nextLayer.append(other)
+                    break
+                if level[other]==depth:
+                    if atom<other:
+                        halves=sorted((code[atom],code[other]))
+                        codes.append(ids.setdefault(
+                            ("bond",bond,halves[0],halves[1]),len(ids)))
+                    break
+            else:
+                codes.append(code[atom])
+        layer=nextLayer
+        depth+=1
+    for start in range(numAtoms):
+        if level[start]!=-1:
+            continue
+        piece=[start]
+        level[start]=-2
+        for atom in piece:
+            for other,_ in neighbors[atom]:
+                if level[other]!=-2:
+                    level[other]=-2
+                    piece.append(other)
+        position={atom:place for place,atom in enumerate(piece)}
+        codes.append(ids.setdefault(("ring",ringCode(
+            [labels[atom] for atom in piece],
+            [[(position[other],bond) for other,bond in neighbors[atom]]
+             for atom in piece],ids)),len(ids)))
+    codes.sort()
+    return ids.setdefault((tuple(codes),tuple(sorted(loose))),len(ids))
+
+
+def moleculeGraph(structure):
+    """canonicalCode's labels, neighbors and loose atoms for a Molecule, as
+    sorted tuples with bond orders for bond labels. a hydrogen on one
+    single bond to another element and nothing else is counted in the
+    label, (symbol, lone pairs, hydrogens), of the atom it's on instead of
+    getting its own, which one it is doesn't change the graph"""
+    kept=[]
+    loose=[]
+    for atom in structure.atoms:
+        domains=atom.electronDomains
+        numLonePairs=domains.count(":")
+        if numLonePairs==len(domains):
+            loose.append((atom.symbol,numLonePairs,0))
+            continue
+        if atom.symbol=="H" and len(domains)==1:
+            bond=domains[0]
+            other=bond.atomTwo if bond.atomOne is atom else bond.atomOne
+            if bond.electrons==2 and other.symbol!="H":
+                continue
+        kept.append(atom)
+    position={id(atom):place for place,atom in enumerate(kept)}
+    labels=[]
+    neighbors=[]
+    for atom in kept:
+        domains=atom.electronDomains
+        numLonePairs=domains.count(":")
+        bonded=[]
+        for domain in domains:
+            if domain==":":
+                continue
+            other=domain.atomTwo if domain.atomOne is atom else domain.atomOne
+            place=position.get(id(other))
+            if place is not None:
+                bonded.append((place,domain.electrons>>1))
+        labels.append((atom.symbol,numLonePairs,
+                       len(domains)-numLonePairs-len(bonded)))
+        bonded.sort()
+        neighbors.append(tuple(bonded))
+    loose.sort()
+    return tuple(labels),tuple(neighbors),tuple(loose)
+
+def compactGraph(state):
+    """moleculeGraph of a CompactMolecule, read straight off its arrays"""
+    numAtoms=state.numAtoms
+    symbols=state.symbols
+    lonePairs=state.lonePairs
+    neighbors=state.neighbors
+    order=state.order
+    kept=[atom for atom in range(numAtoms) if neighbors[atom] and (
+        symbols[atom]!="H" or len(neighbors[atom])!=1 or lonePairs[atom] or
+        order[atom*numAtoms+neighbors[atom][0]]!=1 or
+        symbols[neighbors[atom][0]]=="H")]
+    loose=sorted((symbols[atom],lonePairs[atom],0)
+                 for atom in range(numAtoms) if not neighbors[atom])
+    position=[-1]*numAtoms
+    for place,atom in enumerate(kept):
+        position[atom]=place
+    labels=[]
+    graph=[]
+    for atom in kept:
+        row=atom*numAtoms
+        bonded=[(position[other],order[row+other])
+                for other in neighbors[atom] if position[other]>=0]
+        labels.append((symbols[atom],lonePairs[atom],
+                       len(neighbors[atom])-len(bonded)))
+        bonded.sort()
+        graph.append(tuple(bonded))
+    return tuple(labels),tuple(graph),tuple(loose)
+
+
+class VisitedStates:
+    """the states a search has been to, up to relabelling, kept as the
+    integer canonicalCode of each"""
+    __slots__ = ["ids", "codes"]
+    def __init__(self):
+        self.ids={}
+        self.codes=set()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def visit(self,graph):
+        """marks the state with moleculeGraph graph visited, False if it
+        already was"""
+        code=canonicalCode(*graph,self.ids)
+        if code in self.codes:
+            return False
+        self.codes.add(code)
+        return True
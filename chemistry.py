@@ -1,14 +1,18 @@
 """atom and bond classes and methods"""
 from helperFunctions import*
+from periodicTable import ELEMENTS
 from collections import deque
+
+#penalties a molecule's score gives single bonds between these elements
+SINGLE_BOND_PENALTIES={("O","O"):20,("N","N"):10,("F","F"):20,
+                       ("O","F"):7,("F","O"):7,("O","N"):1/2,("N","O"):1/2}
+
 class Atom:
     
     __slots__ = [
-        "symbol", "electronDomains", "mol", "molarMass", "valenceElectrons",
-        "prefBonds", "atomicNumber", "canExpandOctet", "electroNegativity",
-        "currentElectrons", "octetElectrons",
-        "centerX", "centerY","strAtom","surroundingSet","alreadyChecked",
-        "predecessor"
+        "symbol", "electronDomains", "mol", "element", "canExpandOctet",
+        "currentElectrons", "centerX", "centerY","strAtom","surroundingSet",
+        "alreadyChecked","predecessor","scoreTerms","scoreStale"
     ]
     def __init__(self,symbol):
         self.symbol=symbol
@@ -16,44 +20,13 @@ class Atom:
         #electron domains contain bonds and lone pairs
         self.electronDomains =[]
 
-        #only these atoms are used in lewis structures
-        allElements = {
-    "H":  [1.01, 1, 1, 1, False, 2.20],
-    "C":  [12.01, 4, 4, 6, False, 2.55],
-    "N":  [14.01, 5, 3, 7, False, 3.04],
-    "O":  [16.00, 6, 2, 8, False, 3.44],
-    "S":  [32.07, 6, 2, 16, True, 2.58],
-    "F":  [19.00, 7, 1, 9, False, 3.98],
-    "Cl": [34.45, 7, 1, 17, True, 3.16],
-    "Br": [79.70, 7, 1, 35, True, 2.96],
-    "P":  [30.97, 5, 3, 15, True, 2.19],
-    "I":  [126.90, 7, 1, 53, True, 2.66],
-    "He": [4.00, 8, 4, 2, False, 0.0],  
-    "Ne": [20.18, 8, 4, 10, False, 0.0],
-    "Ar": [39.95, 8, 4, 18, True, 0.0],
-    "Kr": [83.80, 8, 4, 36, True, 3.0],  # approximate
-    "Xe": [131.29, 8, 4, 54, True, 2.6], # approximate
-    "B":  [10.81, 3, 3, 5, False, 2.04],
-    "Be": [9.01, 2, 2, 4, False, 1.57],
-    "Si": [28.09, 4, 4, 14, True, 1.90],
-    "Al": [26.98, 3, 3, 13, True, 1.61]
-        }
-               
-        element=allElements[symbol]
-        self.molarMass=element[0]
-        self.valenceElectrons=element[1]
-        self.prefBonds=element[2]
-        self.atomicNumber=element[3]
-        self.canExpandOctet=False and element[4]
-        self.electroNegativity=element[5]
+        #only elements in periodicTable are used in lewis structures
+        self.element=ELEMENTS[symbol]
+        self.canExpandOctet=False and self.element.canExpandOctet
         
         #number of electrons attached to self
         self.currentElectrons=0
 
-        #indicates number of electrons needed to complete an octet
-        self.octetElectrons=(8 if symbol not in {"B","Al","H","Be"} else 
-        (6 if symbol in {"B","Al"} else (4 if symbol=="Be" else 2)))
-
         self.strAtom=symbol+"|"
 
         self.surroundingSet=set()
@@ -68,7 +41,39 @@ class Atom:
         #atom that this atom uses to get a position
         self.predecessor=None
 
+        #molecule this atom tells about its changes
+        self.mol=None
+        #the part of the molecule's score last added up for this atom, see
+        #getScoreTerms, and whether it changed since
+        self.scoreTerms=(0,0,0)
+        self.scoreStale=False
+
+
+
+    @property
+    def molarMass(self):
+        return self.element.molarMass
+
+    @property
+    def valenceElectrons(self):
+        return self.element.valenceElectrons
+
+    @property
+    def prefBonds(self):
+        return self.element.prefBonds
+
+    @property
+    def atomicNumber(self):
+        return self.element.atomicNumber
 
+    @property
+    def electroNegativity(self):
+        return self.element.electroNegativity
+
+    @property
+    def octetElectrons(self):
+        """number of electrons needed to complete an octet"""
+        return self.element.octetElectrons
 
     def getElectrons(self):
         """number of electrons attached to an atom"""
@@ -161,10 +166,23 @@ class Atom:
 
         return False
     
+    def changed(self,other=None):
+        """puts self (and other) on the molecule's list of atoms to rescore,
+        after a bond or lone pair on them changed"""
+        mol=self.mol
+        if mol is not None:
+            if not self.scoreStale:
+                self.scoreStale=True
+                mol.unscored.append(self)
+            if other is not None and not other.scoreStale:
+                other.scoreStale=True
+                mol.unscored.append(other)
+
     def addLonePair(self):
         """adds lone pair to atom"""
         self.currentElectrons+=2
         self.electronDomains.append(":")
+        self.changed()
         return True
     
     def removeLonePair(self):
@@ -173,9 +191,10 @@ class Atom:
         try:
             self.electronDomains.remove(":")
             self.currentElectrons-=2
-            return True
         except:
             return False
+        self.changed()
+        return True
        
     def sigmaBond(self,other):
         """single bonds self and other"""
@@ -202,6 +221,10 @@ class Atom:
         #updates surroundings
         surroundingSet.add(other)
         otherSurroundingSet.add(self)
+        self.changed(other)
+        mol=self.mol
+        if mol is not None and mol.connectivity is not None:
+            mol.bondAdded(self,other)
         return newBond
     
     def unBond(self,other,bond):
@@ -212,6 +235,10 @@ class Atom:
         other.electronDomains.remove(bond)
         self.surroundingSet.discard(other)
         other.surroundingSet.discard(self)
+        self.changed(other)
+        mol=self.mol
+        if mol is not None and mol.connectivity is not None:
+            mol.bondRemoved(self,other)
         return True
         
     def getFormalCharge(self):
@@ -224,6 +251,20 @@ class Atom:
             return 1000000
         return valence
     
+    def getScoreTerms(self):
+        """this atom's part of Molecule.getScore: its absolute formal charge
+        if it counts (it has an octet it can't expand), 1 if it has a formal
+        charge at all, and the penalties of the single bonds it's atomOne of"""
+        formalCharge=self.getFormalCharge()
+        counted=(abs(formalCharge) if not self.canExpandOctet and
+                 self.hasOctet() else 0)
+        penalty=0
+        for domain in self.electronDomains:
+            if domain!=":" and domain.atomOne is self and domain.type=="-":
+                penalty+=SINGLE_BOND_PENALTIES.get((self.symbol,
+                                                    domain.atomTwo.symbol),0)
+        return (counted,1 if formalCharge else 0,penalty)
+
     def atomToStr(self,lp=False,polarityCheck=False): #lp means 
         #strings contain lone pairs, polarity check doesn't include bond types
         """turns atom into a string for duplicate and polarity check"""
@@ -494,7 +535,7 @@ selfAtomTwo==other[0]))
              self.type="≡"
              self.electrons=6
              success=True
-        
+         atomOne.changed(atomTwo)
          return success
      
      def removePi(self):
@@ -508,15 +549,17 @@ selfAtomTwo==other[0]))
              atomTwo.currentElectrons-=2
              self.type="="
              self.electrons=4
+             atomOne.changed(atomTwo)
              return True
          elif self.type=="=":
              atomOne.currentElectrons-=2
              atomTwo.currentElectrons-=2
              self.type="-"
              self.electrons=2
+             atomOne.changed(atomTwo)
              return True
          return False
-     
+
      def getOther(self,atom):
          """returns the atom that is not the atom"""
          atomOne_=self.atomOne
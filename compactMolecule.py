@@ -0,0 +1,341 @@
+"""array backed molecule state for the backtracking hot path.
+
+bond orders live in a flat n*n list, and every per atom count the
+enumerators look at (electrons, lone pairs, single and multiple bonds) has
+its own list, so octet, formal charge and over bonding checks are O(1)
+lookups instead of scans over electronDomains. Molecule objects are only
+built, with toMolecule, for the structures that make it to the end"""
+from chemistry import Atom, Bond, SINGLE_BOND_PENALTIES
+from moleculeClass import Molecule
+from unionFind import RollbackUnionFind
+
+BOND_TYPES=("","-","=","≡")
+
+#how hasOctet treats each element
+NORMAL,HYDROGEN,BERYLLIUM,BORON=0,1,2,3
+KINDS={"H":HYDROGEN,"Be":BERYLLIUM,"B":BORON,"Al":BORON}
+
+
+def getBondOrder(bonds,numAtoms):
+    """the order getBondList lists bonds in, for a molecule whose atoms
+    hold their bonds in the order of bonds"""
+    atomBonds=[[] for _ in range(numAtoms)]
+    for bond in bonds:
+        atomBonds[bond[0]].append(bond)
+        atomBonds[bond[1]].append(bond)
+    ordered=[]
+    seen=set()
+    for domains in atomBonds:
+        for bond in domains:
+            if bond not in seen:
+                seen.add(bond)
+                ordered.append(bond)
+    return ordered
+
+
+class CompactMolecule:
+    """the state backtracker's compact search works on. built from a
+    Molecule that is still all atoms, or copied from another one"""
+    __slots__ = [
+        "symbols", "numAtoms", "valence", "prefBonds", "kinds", "order",
+        "neighbors", "electrons", "lonePairs", "singles", "multiples",
+        "bonds", "octet", "charge", "formula", "numElectrons",
+        "idealBondElectrons", "currentElectrons", "bondElectrons",
+        "formalChargeSum", "connectivity"
+    ]
+    def __init__(self,molecule=None):
+        if molecule is None:
+            return
+        if molecule.expandedOctet:
+            raise ValueError("expanded octets aren't supported")
+        atoms=molecule.atoms
+        numAtoms=len(atoms)
+        self.symbols=[atom.symbol for atom in atoms]
+        self.numAtoms=numAtoms
+        self.valence=[atom.valenceElectrons for atom in atoms]
+        self.prefBonds=[atom.prefBonds for atom in atoms]
+        self.kinds=[KINDS.get(symbol,NORMAL) for symbol in self.symbols]
+        self.order=[0]*(numAtoms*numAtoms)
+        self.neighbors=[[] for _ in range(numAtoms)]
+        self.electrons=[0]*numAtoms
+        self.lonePairs=[0]*numAtoms
+        self.singles=[0]*numAtoms
+        self.multiples=[0]*numAtoms
+        #bonds as (atom index, atom index), in the order they were made
+        self.bonds=[]
+        self.charge=molecule.charge
+        self.formula=molecule.formula
+        self.numElectrons=molecule.numElectrons
+        self.idealBondElectrons=molecule.idealBondElectrons
+        self.currentElectrons=molecule.currentElectrons
+        self.bondElectrons=molecule.bondElectrons
+        self.formalChargeSum=molecule.formalChargeSum
+        self.connectivity=RollbackUnionFind(numAtoms)
+        index={atom:position for position,atom in enumerate(atoms)}
+        for atom in atoms:
+            for _ in range(atom.electronDomains.count(":")):
+                self.addLonePair(index[atom])
+        for bond in molecule.getBondList():
+            one=index[bond.atomOne]
+            two=index[bond.atomTwo]
+            self.changeBond(one,two,bond.electrons>>1)
+            self.bonds.append((one,two))
+            self.connectivity.union(one,two)
+        self.octet=[self.hasOctet(atom) is True for atom in range(numAtoms)]
+
+    def copy(self):
+        new=CompactMolecule()
+        for name in ("symbols","numAtoms","valence","prefBonds","kinds",
+                     "charge","formula","numElectrons",
+                     "idealBondElectrons","currentElectrons","bondElectrons",
+                     "formalChargeSum"):
+            setattr(new,name,getattr(self,name))
+        for name in ("order","electrons","lonePairs","singles","multiples",
+                     "bonds","octet"):
+            setattr(new,name,getattr(self,name)[:])
+        new.neighbors=[atoms[:] for atoms in self.neighbors]
+        new.connectivity=(None if self.connectivity is None else
+                          self.connectivity.copy())
+        return new
+
+    def snapshot(self):
+        """what cloneMolecule would give, bonds listed the way the clone's
+        getBondList lists them"""
+        new=self.copy()
+        numAtoms=self.numAtoms
+        #cloneMolecule adds bonds in getBondList order, so a clone of a
+        #clone lists them in that order's getBondList order
+        for _ in range(2):
+            new.bonds=sorted(getBondOrder(new.bonds,numAtoms),
+                key=lambda bond: min(self.prefBonds[bond[0]],
+                                     self.prefBonds[bond[1]]),reverse=True)
+        new.bondElectrons=self.currentElectrons
+        new.octet=[new.hasOctet(atom) is True for atom in range(numAtoms)]
+        return new
+
+    def withSkeleton(self,bonds):
+        """a copy of this state, which has no bonds yet, with the single
+        bonds (atom index pairs) of a skeleton. the same state as
+        CompactMolecule of the skeleton DFS's clone of it"""
+        new=self.copy()
+        numAtoms=self.numAtoms
+        prefBonds=self.prefBonds
+        #the clone got its bonds in getBondList order, and is read, and so
+        #built, in its own getBondList order
+        for _ in range(2):
+            bonds=sorted(getBondOrder(bonds,numAtoms),
+                key=lambda bond: min(prefBonds[bond[0]],prefBonds[bond[1]]),
+                reverse=True)
+        for one,two in bonds:
+            new.changeBond(one,two,1)
+        new.bonds=bonds
+        new.trackConnectivity()
+        new.currentElectrons=self.currentElectrons+2*len(bonds)
+        new.bondElectrons=new.currentElectrons
+        new.octet=[new.hasOctet(atom) is True for atom in range(numAtoms)]
+        return new
+
+    def toMolecule(self):
+        """builds the Molecule, atoms and bonds in the same order
+        cloneMolecule would have them"""
+        atomList=[]
+        for atom in range(self.numAtoms):
+            newAtom=Atom(self.symbols[atom])
+            newAtom.canExpandOctet=False
+            for _ in range(self.lonePairs[atom]):
+                newAtom.addLonePair()
+            newAtom.currentElectrons=self.electrons[atom]
+            atomList.append(newAtom)
+        for one,two in self.bonds:
+            atomOne=atomList[one]
+            atomTwo=atomList[two]
+            newBond=Bond(BOND_TYPES[self.order[one*self.numAtoms+two]],
+                         atomOne,atomTwo)
+            atomOne.electronDomains.append(newBond)
+            atomTwo.electronDomains.append(newBond)
+        newMolecule=Molecule(atomList,self.charge,self.formula)
+        newMolecule.formalChargeSum=self.formalChargeSum
+        newMolecule.expandedOctet=False
+        newMolecule.currentElectrons=self.currentElectrons
+        newMolecule.bondElectrons=self.currentElectrons
+        return newMolecule
+
+    def bondOrder(self,one,two):
+        return self.order[one*self.numAtoms+two]
+
+    def hasOctet(self,atom):
+        """same answers as Atom.hasOctet"""
+        kind=self.kinds[atom]
+        singles=self.singles[atom]
+        if kind==HYDROGEN:
+            if not (self.neighbors[atom] or self.lonePairs[atom]):
+                return None
+            if singles>1 or self.lonePairs[atom] or self.multiples[atom]:
+                return False
+            if singles==1:
+                return True
+        elif kind!=NORMAL:
+            most=2 if kind==BERYLLIUM else 3
+            if self.lonePairs[atom] or self.multiples[atom] or singles>most:
+                return False
+            if singles==most:
+                return True
+            return None
+        electrons=self.electrons[atom]
+        if electrons==8:
+            return True
+        if electrons<8:
+            return None
+        return False
+
+    def getFormalCharge(self,atom):
+        """same value, and type, as Atom.getFormalCharge"""
+        lonePairs=self.lonePairs[atom]
+        valence=self.valence[atom]
+        formalCharge=valence-2*lonePairs
+        if self.neighbors[atom]:
+            formalCharge-=(self.electrons[atom]>>1)-lonePairs
+            formalCharge=float(formalCharge)
+        if valence==8 and formalCharge:
+            return 1000000
+        return formalCharge
+
+    def isOverBonded(self,atom):
+        """checkOverBonding, without expanded octets"""
+        if self.electrons[atom]>=8:
+            return True
+        symbol=self.symbols[atom]
+        if symbol=="H":
+            return bool(self.neighbors[atom] or self.lonePairs[atom])
+        singles=self.singles[atom]
+        if symbol=="O":
+            return singles>=2
+        if symbol=="N":
+            return singles>=3
+        return self.valence[atom]==7 and singles>=1
+
+    def hasBadCarbon(self):
+        """badCarbon, a carbon with less than 2 bonds"""
+        for atom in range(self.numAtoms):
+            if self.symbols[atom]=="C" and len(self.neighbors[atom])<2:
+                return True
+        return False
+
+    def trackConnectivity(self):
+        """builds the union find from the current bonds. it can only take
+        back bonds made after this"""
+        connectivity=RollbackUnionFind(self.numAtoms)
+        for one,two in self.bonds:
+            connectivity.union(one,two)
+        connectivity.history=[]
+        self.connectivity=connectivity
+        return connectivity
+
+    def isBondedOrCircular(self):
+        """same tuple as Molecule.isBondedOrCircular: is every atom
+        connected, and is there a ring in the first atom's piece"""
+        connectivity=self.connectivity or self.trackConnectivity()
+        return (connectivity.isConnected(),connectivity.hasRing(0))
+
+    def hasRing(self,atom):
+        """whether atom's piece has a ring"""
+        connectivity=self.connectivity or self.trackConnectivity()
+        return connectivity.hasRing(atom)
+
+    def changeBond(self,one,two,newOrder):
+        """sets the order of the bond between two atoms, 0 for no bond,
+        keeping every count up to date"""
+        numAtoms=self.numAtoms
+        oldOrder=self.order[one*numAtoms+two]
+        self.order[one*numAtoms+two]=newOrder
+        self.order[two*numAtoms+one]=newOrder
+        if not oldOrder:
+            self.neighbors[one].append(two)
+            self.neighbors[two].append(one)
+        elif not newOrder:
+            self.neighbors[one].remove(two)
+            self.neighbors[two].remove(one)
+        change=2*(newOrder-oldOrder)
+        for atom in (one,two):
+            self.electrons[atom]+=change
+            if oldOrder==1:
+                self.singles[atom]-=1
+            elif oldOrder:
+                self.multiples[atom]-=1
+            if newOrder==1:
+                self.singles[atom]+=1
+            elif newOrder:
+                self.multiples[atom]+=1
+
+    def sigmaBond(self,one,two):
+        """Atom.sigmaBond, returns whether the bond was made"""
+        for atom in (one,two):
+            if (self.kinds[atom]==HYDROGEN and
+                (self.neighbors[atom] or self.lonePairs[atom])):
+                return False
+        if self.order[one*self.numAtoms+two]:
+            return False
+        self.changeBond(one,two,1)
+        self.bonds.append((one,two))
+        if self.connectivity is not None:
+            self.connectivity.union(one,two)
+        return True
+
+    def unBond(self,one,two):
+        #bonds are always taken off in the reverse order they were made
+        self.changeBond(one,two,0)
+        self.bonds.pop()
+        if (self.connectivity is not None and
+            not self.connectivity.rollback(one,two)):
+            #a copy's union find can't take back bonds from before it was
+            #copied, built again when it's next needed
+            self.connectivity=None
+
+    def addPi(self,one,two):
+        self.changeBond(one,two,self.order[one*self.numAtoms+two]+1)
+
+    def removePi(self,one,two):
+        """takes back the last addPi"""
+        self.changeBond(one,two,self.order[one*self.numAtoms+two]-1)
+
+    def addLonePair(self,atom):
+        self.lonePairs[atom]+=1
+        self.electrons[atom]+=2
+
+    def addUntilOctet(self,atom):
+        for _ in range((8-self.electrons[atom])//2):
+            self.addLonePair(atom)
+
+    def removeAllLonePairs(self):
+        """Molecule.removeAllLonePairs, including taking the lone pairs'
+        electrons off currentElectrons"""
+        removed=0
+        for atom in range(self.numAtoms):
+            lonePairs=self.lonePairs[atom]
+            if lonePairs:
+                removed+=lonePairs
+                self.electrons[atom]-=2*lonePairs
+                self.lonePairs[atom]=0
+        self.currentElectrons-=removed*2
+
+    def getBondListNoH(self):
+        symbols=self.symbols
+        return [bond for bond in self.bonds
+                if symbols[bond[0]]!="H" and symbols[bond[1]]!="H"]
+
+    def getScore(self):
+        """same score Molecule.getScore gives the built molecule"""
+        numAtoms=self.numAtoms
+        charges=[abs(self.getFormalCharge(atom)) for atom in range(numAtoms)
+                 if self.hasOctet(atom)]
+        score=sum(charges)
+        symbols=self.symbols
+        for one,two in self.bonds:
+            if self.order[one*numAtoms+two]==1:
+                score+=SINGLE_BOND_PENALTIES.get((symbols[one],symbols[two]),
+                                                 0)
+        numChargeAtoms=len([atom for atom in range(numAtoms)
+                            if self.getFormalCharge(atom)])
+        if numChargeAtoms:
+            score+=sum(charges)/numChargeAtoms
+        return score
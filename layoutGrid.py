@@ -0,0 +1,132 @@
+"""hash grid over the canvas for the layout's collision checks, so they look
+at the atoms and bonds around a spot instead of every one in the molecule.
+
+atoms sit on a 65 unit lattice, so the cells are 65 wide. every atom is in
+the cell of its position and every bond in the cells its bounding box
+covers, placed or not, so lookups give the same answers as the linear scans
+over molecule.atoms and getBondList did. a bond from a placed atom to one
+that isn't is drawn to (0,0) and covers a lot of cells, bonds like that are
+kept in a list every lookup goes through"""
+from chemistry import Bond
+from helperFunctions import getDistance
+
+CELL=65
+#bonds whose box spans more cells than this on a side go in the big list
+MAX_SPAN=4
+
+
+def cellRange(low,high):
+    return range(int(low//CELL),int(high//CELL)+1)
+
+
+class LayoutGrid:
+    __slots__ = ["order", "atomCells", "bondCells", "bigBonds", "atoms",
+                 "bonds"]
+    def __init__(self,molecule):
+        #lookups hand back atoms in the molecule's order
+        self.order={atom:index for index,atom in enumerate(molecule.atoms)}
+        #cell -> atoms in it, atom -> its cell
+        self.atomCells={}
+        self.atoms={}
+        #cell -> bonds over it, bond -> its cells (None when it's big)
+        self.bondCells={}
+        self.bonds={}
+        self.bigBonds=set()
+        for atom in molecule.atoms:
+            self.addAtom(atom)
+        for bond in molecule.getBondList():
+            self.addBond(bond)
+
+    def addAtom(self,atom):
+        cell=(int(atom.centerX//CELL),int(atom.centerY//CELL))
+        self.atoms[atom]=cell
+        self.atomCells.setdefault(cell,[]).append(atom)
+
+    def removeAtom(self,atom):
+        self.atomCells[self.atoms.pop(atom)].remove(atom)
+
+    def addBond(self,bond):
+        one=bond.atomOne
+        two=bond.atomTwo
+        xs=cellRange(min(one.centerX,two.centerX),max(one.centerX,two.centerX))
+        ys=cellRange(min(one.centerY,two.centerY),max(one.centerY,two.centerY))
+        if len(xs)>MAX_SPAN or len(ys)>MAX_SPAN:
+            self.bonds[bond]=None
+            self.bigBonds.add(bond)
+            return
+        cells=[(x,y) for x in xs for y in ys]
+        self.bonds[bond]=cells
+        for cell in cells:
+            self.bondCells.setdefault(cell,set()).add(bond)
+
+    def removeBond(self,bond):
+        cells=self.bonds.pop(bond)
+        if cells is None:
+            self.bigBonds.discard(bond)
+            return
+        for cell in cells:
+            self.bondCells[cell].discard(bond)
+
+    def place(self,atom,x,y):
+        """moves atom to x,y, along with the bonds it's on"""
+        bonds=[domain for domain in atom.electronDomains
+               if isinstance(domain,Bond)]
+        self.removeAtom(atom)
+        for bond in bonds:
+            self.removeBond(bond)
+        atom.centerX=x
+        atom.centerY=y
+        self.addAtom(atom)
+        for bond in bonds:
+            self.addBond(bond)
+
+    def atomsIn(self,lowX,lowY,highX,highY):
+        """atoms in the cells the box covers"""
+        atomCells=self.atomCells
+        found=[]
+        for x in cellRange(lowX,highX):
+            for y in cellRange(lowY,highY):
+                found+=atomCells.get((x,y),())
+        return found
+
+    def bondsIn(self,lowX,lowY,highX,highY):
+        """bonds over the cells the box covers, every big one included"""
+        bondCells=self.bondCells
+        found=set(self.bigBonds)
+        for x in cellRange(lowX,highX):
+            for y in cellRange(lowY,highY):
+                found.update(bondCells.get((x,y),()))
+        return found
+
+    def atomAt(self,x,y,radius=10):
+        """Molecule.hasAtomThere: the first atom within radius of x,y or
+        False"""
+        close=[atom for atom in self.atomsIn(x-radius,y-radius,x+radius,
+                                             y+radius)
+               if getDistance(atom.centerX,atom.centerY,x,y)<=radius]
+        if not close:
+            return False
+        return min(close,key=self.order.__getitem__)
+
+    def atomsNearBond(self,bond):
+        """every atom that could be on bond"""
+        one=bond.atomOne
+        two=bond.atomTwo
+        return self.atomsIn(min(one.centerX,two.centerX),
+                            min(one.centerY,two.centerY),
+                            max(one.centerX,two.centerX),
+                            max(one.centerY,two.centerY))
+
+    def bondsNearBond(self,bond):
+        """every bond that could cross bond or have one of its atoms on it"""
+        one=bond.atomOne
+        two=bond.atomTwo
+        return self.bondsIn(min(one.centerX,two.centerX),
+                            min(one.centerY,two.centerY),
+                            max(one.centerX,two.centerX),
+                            max(one.centerY,two.centerY))
+
+    def bondsNearAtom(self,atom):
+        """every bond atom could be on"""
+        return self.bondsIn(atom.centerX,atom.centerY,atom.centerX,
+                            atom.centerY)
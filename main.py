@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from pydantic import BaseModel
 from moleculeClass import*
 from helperFunctions import*
@@ -7,84 +7,180 @@ from backtracker import*
 from breadthFirst import*
 from moleculeSolver import*
 from tokenizer import*
+from moleculeResponse import*
+from resultCache import ResultCache
+from structureStore import StructureStore
+from singleFlight import SingleFlight
+from structurePool import StructurePool, PoolBusy
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
 import asyncio
 import json
-import concurrent.futures
-executor = concurrent.futures.ProcessPoolExecutor()
+import os
 
+#enumeration is cpu bound, so it runs in worker processes instead of threads
+structurePool=StructurePool.fromEnvironment()
 
+#loaded once at startup, shared by every request in this process
+resultCache=ResultCache.fromEnvironment("cache.json")
 
-def getMoleculeInfo(molecule):
-    """returns info about the molecule like polarity and molar mass"""
-    result={} 
-    result["molar mass"] = str(round(molecule.getMolarMass(), 2)) + "g"
-    result["polarity"]=molecule.getPolarity()
-    result["σ bonds"]=str(molecule.countSigma())
-    result["π bonds"]=str(molecule.countPi())
-    return result
+#precomputed by structureStore.py, checked before the cache
+structureStore=StructureStore(os.environ.get("ISOMER_STORE","structures.db"))
 
-def getAtomsInfo(molecule):
-    """gets info of ATOMS like VSEPR ,bond angles, and Hybirdization"""
-    result={}
-    for atom in molecule.atoms:
-        info={}
-        info["Hybirdization"]= atom.getHybirdization()
-        vsepr=atom.getVSEPR()
-        info["VSEPR"]=vsepr[0]
-        info["bond angles"]=vsepr[1]
-        fc=(int(atom.getFormalCharge()))
-        info["formal charge"]=str(fc) if fc<=0 else "+"+str(fc)
-        result[f"{atom.centerX},{atom.centerY}"]=info
-    return result
+#identical requests that miss the cache at the same time share one enumeration
+inFlight=SingleFlight()
+
+#how often a request waiting on enumeration checks if its client left
+DISCONNECT_POLL_SECONDS=0.5
 
 
 
-def getMolecule(molecule):
-    """gets all the positions of the atoms, bonds, and  lp's in the molecule"""
-    molecule.assignPositions(1000,600)
-    atoms = {f"{atom.centerX},{atom.centerY}": 
-             atom.symbol for atom in molecule.atoms}
-    bonds=molecule.assignBonds()
-    lonePairs=molecule.getLonePairs()
-    atomsInfo=getAtomsInfo(molecule)
-    molInfo=getMoleculeInfo(molecule)
-    return {"atoms": atoms, "bonds": bonds,"lonePairs":lonePairs,
-            "atomsInfo":atomsInfo,"molInfo":molInfo}
+def lookup(moleculeStr):
+    """the precomputed result, else the cached one, else None"""
+    result=structureStore.get(moleculeStr)
+    if result is None:
+        result=resultCache.get(moleculeStr)
+    return result
 
-api=FastAPI()
+async def computeMolecule(moleculeName,moleculeStr,withStats=False):
+    result,truncated,stats=await structurePool.enumerate(moleculeName,
+                                                         withStats)
+    #a cut short search isn't the real answer, so it isn't cached
+    if not truncated:
+        resultCache.put(moleculeStr,result)
+    return (result,truncated,stats)
+
+async def cancelOnDisconnect(request,awaitable):
+    """awaits awaitable, cancelling it if the client disconnects first.
+    returns None if it was cancelled"""
+    task=asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done,_=await asyncio.wait({task},timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                return None
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+async def streamStructures(moleculeName,moleculeStr,cached):
+    """ndjson lines for the streaming endpoint, caching the final set"""
+    if cached is not None:
+        for index in range(len(cached)):
+            yield json.dumps({"type":"structure","index":index,
+                              "structure":cached[str(index)]})+"\n"
+        yield json.dumps({"type":"done","best":list(range(len(cached))),
+                          "truncated":False})+"\n"
+        return
+    structures={}
+    try:
+        async for message in structurePool.stream(moleculeName):
+            if message["type"]=="structure":
+                structures[message["index"]]=message["structure"]
+            elif message["type"]=="done" and not message["truncated"]:
+                result={str(index):structures[best] for index,best in
+                        enumerate(message["best"])}
+                resultCache.put(moleculeStr,result)
+            yield json.dumps(message)+"\n"
+    except PoolBusy:
+        yield json.dumps({"type":"error",
+                    "error":"server busy, every worker is enumerating"})+"\n"
+
+def commonKeys():
+    """cache keys of the commonNames molecules, which are never evicted"""
+    keys=set()
+    for formula in commonNames.values():
+        try:
+            keys.add(formulaKey(formula))
+        except Exception:
+            pass
+    return keys
+
+@asynccontextmanager
+async def lifespan(app):
+    structureStore.open()
+    resultCache.pin(commonKeys())
+    resultCache.start()
+    structurePool.start()
+    yield
+    structurePool.stop()
+    resultCache.stop()
+    structureStore.close()
+
+api=FastAPI(lifespan=lifespan)
 api.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
     allow_methods=["*"],
     allow_headers=["*"],
+    #browsers hide response headers from cross origin scripts unless told
+    expose_headers=["X-Structures-Truncated"],
 )
 
 
 @api.get("/molecule")
-async def getAllMolecules(moleculeName:str):
+async def getAllMolecules(moleculeName:str,request:Request,
+                          response:Response,stats:bool=False):
+    """with ?stats=1 the search always runs, and the response is
+    {"structures": the usual result, "stats": what the search did}"""
     try:
-        testMol=parseMolecule(moleculeName)
+        #moleculeStr is a unique string of the molecule
+        moleculeStr=formulaKey(moleculeName)
     except:
         return {}
-    #moleculeStr is a unique string of the molecule
-    moleculeStr=testMol.uniqueString()
-    with open("cache.json", "r") as f:
-        data = json.load(f)
-    if moleculeStr in data:
-        return data[moleculeStr]
-    result={}
+    cached=None if stats else lookup(moleculeStr)
+    if cached is not None:
+        return cached
+    if stats:
+        #its own search, sharing one wouldn't say what this one did
+        work=computeMolecule(moleculeName,moleculeStr,True)
+    else:
+        work=inFlight.run(moleculeStr,
+                          lambda: computeMolecule(moleculeName,moleculeStr))
     try:
-       moleculeList=await asyncio.to_thread(getBestStructures,moleculeName)
-       print("molecule received")
+       computed=await cancelOnDisconnect(request,work)
+    except asyncio.CancelledError:
+        raise
+    except PoolBusy:
+        return JSONResponse(status_code=503,headers={"Retry-After":"5"},
+                content={"error":"server busy, every worker is enumerating"})
     except:
         return {}
-    for index in range(len(moleculeList)):
-        result[str(index)]=getMolecule(moleculeList[index])
-    data[moleculeStr]=result
-    with open("cache.json", "w") as f:
-        json.dump(data, f, indent=4)
+    if computed is None:
+        #client is gone, nobody reads this
+        return {}
+    result,truncated,searchStats=computed
+    if truncated:
+        response.headers["X-Structures-Truncated"]="true"
+    if stats:
+        return {"structures":result,"stats":searchStats}
     return result
 
+@api.get("/molecule/stream")
+async def streamMolecules(moleculeName:str):
+    """streams structures as newline delimited json while they're found"""
+    try:
+        moleculeStr=formulaKey(moleculeName)
+    except:
+        return {}
+    cached=lookup(moleculeStr)
+    if cached is None and not structurePool.hasCapacity():
+        return JSONResponse(status_code=503,headers={"Retry-After":"5"},
+                content={"error":"server busy, every worker is enumerating"})
+    return StreamingResponse(streamStructures(moleculeName,moleculeStr,cached),
+                             media_type="application/x-ndjson")
+
+@api.get("/cache/stats")
+async def getCacheStats():
+    stats=resultCache.stats()
+    stats["singleFlight"]=inFlight.stats()
+    stats["pool"]=structurePool.stats()
+    stats["store"]=structureStore.stats()
+    return stats
+
 
 
 
@@ -1,14 +1,20 @@
 from chemistry import Bond, Atom
 from helperFunctions import*
 import copy
-from collections import deque
+from collections import deque, Counter
 from specialDict import*
+from unionFind import RollbackUnionFind
+from layoutGrid import LayoutGrid
+from symmetry import polarityHalves
+from treeLayout import layOutTree
 from queue import PriorityQueue
 class Molecule:
      __slots__ = [
         "atoms", "charge", "formula", "numElectrons", "currentElectrons",
         "formalChargeSum", "bondElectrons", "idealBondElectrons",
-        "octetDict", "numAtoms", "expandedOctet"
+        "octetDict", "numAtoms", "expandedOctet",
+        "connectivity", "atomIndex", "absChargeSum", "chargedAtoms",
+        "bondPenalties", "unscored"
     ]
      def __init__(self,atoms,charge,formula):
           #putting atoms with higher bonding capacity first
@@ -52,13 +58,40 @@ class Molecule:
                   atom.canExpandOctet=False
          
           
+          symbolCounts=Counter(atom.symbol for atom in atoms)
           for atom in atoms:
-              if self.count(atom.symbol)!=1:
+              if symbolCounts[atom.symbol]!=1:
                   atom.canExpandOctet=False
           self.expandedOctet=False
           for atom in atoms:
               if atom.canExpandOctet:
                   self.expandedOctet=True
+
+          #the atoms tell the molecule about their changes. atoms already
+          #owned by another molecule (like the pieces split() makes) stay
+          #with it
+          for atom in atoms:
+              if atom.mol is None:
+                  atom.mol=self
+
+          #what getScore adds up. the atoms list themselves in unscored as
+          #they change, and only those are added up again when it's asked
+          #for, so scoring a structure doesn't walk it
+          self.absChargeSum=0
+          self.chargedAtoms=0
+          self.bondPenalties=0
+          self.unscored=[]
+          for atom in atoms:
+              if atom.mol is self:
+                  atom.scoreTerms=(0,0,0)
+                  atom.scoreStale=True
+                  self.unscored.append(atom)
+
+          #union find over the sigma bonds, kept up to date by the atoms
+          #so isBondedOrCircular doesn't have to walk the molecule
+          self.connectivity=None
+          self.atomIndex=None
+          self.trackConnectivity()
                   
           
      def sortAtoms(self):
@@ -121,10 +154,59 @@ class Molecule:
          for atom in self.atoms:
              atom.rearrange()
 
+     def trackConnectivity(self):
+        """builds the union find from the current bonds. only molecules that
+        own all their atoms (atom.mol) hear about bond changes, so for
+        anything else, like split's pieces, it returns False"""
+        self.connectivity=None
+        index={}
+        for position,atom in enumerate(self.atoms):
+            if atom.mol is not self or atom in index:
+                return False
+            index[atom]=position
+        connectivity=RollbackUnionFind(len(self.atoms))
+        for atom in self.atoms:
+            for domain in atom.electronDomains:
+                if isinstance(domain,Bond) and domain.atomOne is atom:
+                    other=index.get(domain.atomTwo)
+                    if other is None:
+                        return False
+                    connectivity.union(index[atom],other)
+        self.atomIndex=index
+        self.connectivity=connectivity
+        return True
+
+     def bondAdded(self,atomOne,atomTwo):
+        index=self.atomIndex
+        self.connectivity.union(index[atomOne],index[atomTwo])
+
+     def bondRemoved(self,atomOne,atomTwo):
+        index=self.atomIndex
+        if not self.connectivity.rollback(index[atomOne],index[atomTwo]):
+            #not the last bond added, built again when it's next needed
+            self.connectivity=None
+
      def isBondedOrCircular(self):
         """returns a tuple with 2 bools
            the first represents whether the molecule is completely bonded
-           the second represents if it's circular"""
+           the second represents if it's circular, meaning the first atom's
+           piece has a ring"""
+        connectivity=self.connectivity
+        if connectivity is not None or self.trackConnectivity():
+            connectivity=self.connectivity
+            return (connectivity.isConnected(),
+                    connectivity.hasRing(self.atomIndex[self.atoms[0]]))
+        return self.searchBondedOrCircular()
+
+     def hasRing(self,atom):
+        """whether atom's piece has a ring. False when the molecule can't
+        keep track of its bonds, see trackConnectivity"""
+        if self.connectivity is None and not self.trackConnectivity():
+            return False
+        return self.connectivity.hasRing(self.atomIndex[atom])
+
+     def searchBondedOrCircular(self):
+        """isBondedOrCircular by walking the bonds from the first atom"""
         isCircular=False
         queue=deque()
         visited=set()
@@ -158,9 +240,11 @@ class Molecule:
      def getBondList(self):
         """a list of all the bonds of the atom"""
         bondList=[]
+        seen=set()
         for atom in self.atoms:
              for domain in atom.electronDomains:
-                 if isinstance(domain,Bond) and domain not in bondList:
+                 if isinstance(domain,Bond) and domain not in seen:
+                     seen.add(domain)
                      bondList.append(domain)
         bondList.sort(key=lambda bond: 
                 min(bond.atomOne.prefBonds,bond.atomTwo.prefBonds)
@@ -176,42 +260,31 @@ class Molecule:
      def sumFormalCharges(self):
         """gets sum of all absolute value of formal charges in a molecule
            used for expanded octet purposes"""
-        charges = [abs(atom.getFormalCharge()) for atom in self.atoms if
-                    (not (atom.canExpandOctet) and atom.hasOctet())]
-        return sum(charges)
+        self.rescore()
+        return self.absChargeSum
+
+     def rescore(self):
+         """brings the score sums up to date with the atoms that changed"""
+         for atom in self.unscored:
+             old=atom.scoreTerms
+             new=atom.scoreTerms=atom.getScoreTerms()
+             atom.scoreStale=False
+             self.absChargeSum+=new[0]-old[0]
+             self.chargedAtoms+=new[1]-old[1]
+             self.bondPenalties+=new[2]-old[2]
+         self.unscored=[]
                        
      def getScore(self,isComplete=True):
                        #isComplete is there so we don't punish molecules that
                        #aren't complete yet
          """returns an int that says how stable the molecule is, lower
          scores preffered"""
-         if self.expandedOctet and not (self.isComplete()):
-             #if its expanded octet, we must recalculate formal charges
-             #a different way
-             score=self.sumFormalCharges()
-         else:
-             score=self.formalChargeSum
-             score=self.sumFormalCharges()
-         bondList=self.getBondList()
-         for bond in bondList:
-             bondType=bond.type
-             atomOne=bond.atomOne
-             atomTwo=bond.atomTwo
-
-             if bondType=="-" and isComplete:
-                 #all these single bonds are unstable
-                 if bond.sameTypeAtoms("O-O"):
-                     score+=20
-                 if bond.sameTypeAtoms("N-N"):
-                     score+=10
-                 if bond.sameTypeAtoms("F-F"):
-                     score+=20
-                 if bond.sameTypeAtoms("O-F"):
-                     score+=7
-                 if bond.sameTypeAtoms("O-N"):
-                     score+=1/2
+         self.rescore()
+         score=self.absChargeSum
          if isComplete:
-            score+= self.getFormalChargeSharing(self.sumFormalCharges())
+             #all these single bonds are unstable
+             score+=self.bondPenalties
+             score+=self.getFormalChargeSharing(self.absChargeSum)
           #  score+=self.punishFormalChargesElectroneg()
          return score
      
@@ -246,14 +319,11 @@ class Molecule:
      def getFormalChargeSharing(self,sumCharges):
          """returns a number indicating how well spread the formal charge is"""
         
-         #this is the absolute value of all formal charges
-         sumCharges=self.sumFormalCharges()
          #number of atoms in the molecule that has a formal charge
-         numChargeAtoms=len([atom for atom in  self.atoms if 
-                                atom.getFormalCharge()])
-         if not numChargeAtoms:
+         self.rescore()
+         if not self.chargedAtoms:
              return 0
-         return sumCharges/numChargeAtoms
+         return sumCharges/self.chargedAtoms
      
     
      def molToStr(self,polarityCheck=False):
@@ -321,9 +391,6 @@ class Molecule:
      def hasSingleCenterAtom(self):
          """returns true if the molecule has a single central atom, used 
          for expanded octets"""
-         molecule=self.cloneMolecule()
-         molecule.atoms.sort(key=lambda atom: atom.valenceElectrons,
-                             reverse=True)
          #the central atom has the most valence electrons
          centralAtom=self.getCenterAtom()
          if centralAtom.countDomains("bond")==1:
@@ -408,6 +475,16 @@ class Molecule:
          if not hasNotHydroCarbon:
              return "non-polar"
          
+         #the halves the molecule splits into around an atom or bond. a
+         #tree gets every half in one pass, anything else splits each time
+         halves=polarityHalves(self)
+         if halves is not None:
+             index,half=halves
+             def split(atom,bond):
+                 return half(index[bond.getOther(atom)],index[atom])
+         else:
+             split=self.split
+
          #if theres an odd number of atoms or theres a central atom
          if len(self.atoms)%2==1 or self.hasSingleCenterAtom():
              for atom in self.atoms:
@@ -419,7 +496,7 @@ class Molecule:
                  for domain in atom.electronDomains:
                      if domain==":":
                          continue
-                     frontierSet.add(self.split(atom,domain))
+                     frontierSet.add(split(atom,domain))
                  if len(frontierSet)==1:
               
                     return "non-polar"
@@ -427,7 +504,7 @@ class Molecule:
              
          else:
              for bond in self.getBondList():
-                 if self.split(bond.atomOne,bond)==self.split(bond.atomTwo,bond):
+                 if split(bond.atomOne,bond)==split(bond.atomTwo,bond):
                      return "non-polar"
              return "polar"
          
@@ -574,11 +651,17 @@ class Molecule:
          return True
               
             
-     def recursiveAssignPositions(self, positionless=None,bondList=None):
-        """recursively backtracks where atoms go on the canvas"""
-        if positionless is None and bondList is None:
-            bondList=self.getBondList()
+     def recursiveAssignPositions(self, positionless=None,grid=None,
+                                  stats=None):
+        """recursively backtracks where atoms go on the canvas. grid keeps
+        track of where everything is so the collision checks only look
+        around the new atom"""
+        if positionless is None:
             positionless = self.getPositionless()
+        if grid is None:
+            grid=LayoutGrid(self)
+        if stats is not None:
+            stats.count("layout.nodes")
 
         #returns true if everything has a position
         if not positionless: 
@@ -594,7 +677,7 @@ class Molecule:
         predecessor=atom.predecessor
         if not predecessor:
             positionless.append(atom)
-            if self.recursiveAssignPositions(positionless):
+            if self.recursiveAssignPositions(positionless,grid,stats):
                     return True
             else:
                 return False
@@ -619,14 +702,15 @@ class Molecule:
                 newX = predecessor.centerX + dx
                 newY = predecessor.centerY + dy
                 newBond=atom.getBond(predecessor)
-                if self.hasAtomThere(newX, newY):
+                if grid.atomAt(newX, newY):
+                    if stats is not None:
+                        stats.count("layout.prune.occupied")
                     continue
-                atom.centerX=newX
-                atom.centerY=newY
+                grid.place(atom,newX,newY)
                 shouldContinue=False
                 if length==130:
                     newBond.isLong=True
-                    for bond in bondList:
+                    for bond in grid.bondsNearBond(newBond):
                         if (not bond.sameAtoms(newBond) and
                             bond.intersects(newBond)):
                             shouldContinue=True
@@ -634,21 +718,25 @@ class Molecule:
                         if bond.intersectsAtom(atom):
                             shouldContinue=True
                             break
-                for atom_ in self.atoms:
-                    if shouldContinue:
-                        break
-                    if newBond.intersectsAtom(atom_):
-                        shouldContinue=True
-                        break
-                    for bond_ in bondList:
+                if not shouldContinue:
+                    for atom_ in grid.atomsNearBond(newBond):
+                        if newBond.intersectsAtom(atom_):
+                            shouldContinue=True
+                            break
+                if not shouldContinue:
+                    for bond_ in grid.bondsNearAtom(atom):
                         if bond_.intersectsAtom(atom):
                             shouldContinue=True
                             break
                 if not shouldContinue:
-                    if self.recursiveAssignPositions(positionless,bondList):
+                    if self.recursiveAssignPositions(positionless,grid,
+                                                     stats):
                         return True 
-                atom.centerX=0
-                atom.centerY=0
+                    if stats is not None:
+                        stats.count("layout.backtracks")
+                elif stats is not None:
+                    stats.count("layout.prune.intersection")
+                grid.place(atom,0,0)
                 if length==130:
                     newBond.isLong=False
                 
@@ -660,26 +748,56 @@ class Molecule:
 
 
 
-     def assignPositions(self,width,height):#positionsList):
+     def assignPositions(self,width,height,stats=None):#positionsList):
         """assign's the best positions to an atom for drawing"""
         self.updateAllSurroundingSets()
         self.atoms[0].centerX=500
         self.atoms[0].centerY=300
         #self.assignHorizontal(width,height)
-        self.recursiveAssignPositions()
+        if not layOutTree(self,500,300,stats):
+            self.recursiveAssignPositions(stats=stats)
         self.center(width,height)
         return
 
      
+     def layoutKey(self):
+        """everything assignPositions looks at: the atoms in order and who
+        each one is bonded to, in the order it holds its bonds. structures
+        with the same key get the same layout, whatever the bond orders and
+        lone pairs"""
+        index={atom:position for position,atom in enumerate(self.atoms)}
+        return tuple((atom.symbol,tuple(index[domain.getOther(atom)] for
+                                        domain in atom.electronDomains
+                                        if isinstance(domain,Bond)))
+                     for atom in self.atoms)
+
+     def copyLayout(self,other):
+        """gives this molecule the positions assignPositions gave other,
+        which has the same layoutKey"""
+        index={atom:position for position,atom in enumerate(other.atoms)}
+        for atom,otherAtom in zip(self.atoms,other.atoms):
+            atom.centerX=otherAtom.centerX
+            atom.centerY=otherAtom.centerY
+            atom.predecessor=(self.atoms[index[otherAtom.predecessor]]
+                              if otherAtom.predecessor else None)
+            for domain,otherDomain in zip(
+                    [domain for domain in atom.electronDomains
+                     if isinstance(domain,Bond)],
+                    [domain for domain in otherAtom.electronDomains
+                     if isinstance(domain,Bond)]):
+                domain.isLong=otherDomain.isLong
+        self.updateAllSurroundingSets()
+
      def getLonePairs(self):
          """assigns positions to lone pairs"""
          positions={}
+         grid=LayoutGrid(self)
          for atom in self.atoms:
              numLonePairs=atom.countDomains(":")
              if numLonePairs:
                 addedLPs=0
                 for dX,dY in [(-75,0),(75,0),(0,-75),(0,75)]:
-                    alreadyThere=self.hasAtomThere(atom.centerX+dX,
+                    alreadyThere=grid.atomAt(atom.centerX+dX,
                                              atom.centerY+dY)
                     if not alreadyThere or (not alreadyThere in 
                                             atom.surroundingSet):
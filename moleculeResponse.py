@@ -0,0 +1,91 @@
+"""turns finished molecules into the json the frontend draws.
+kept apart from main.py so worker processes can import it without the api"""
+from moleculeSolver import getBestStructures, iterBestStructures
+from searchStats import phase
+
+
+def getMoleculeInfo(molecule):
+    """returns info about the molecule like polarity and molar mass"""
+    result={} 
+    result["molar mass"] = str(round(molecule.getMolarMass(), 2)) + "g"
+    result["polarity"]=molecule.getPolarity()
+    result["σ bonds"]=str(molecule.countSigma())
+    result["π bonds"]=str(molecule.countPi())
+    return result
+
+
+def getAtomsInfo(molecule):
+    """gets info of ATOMS like VSEPR ,bond angles, and Hybirdization"""
+    result={}
+    for atom in molecule.atoms:
+        info={}
+        info["Hybirdization"]= atom.getHybirdization()
+        vsepr=atom.getVSEPR()
+        info["VSEPR"]=vsepr[0]
+        info["bond angles"]=vsepr[1]
+        fc=(int(atom.getFormalCharge()))
+        info["formal charge"]=str(fc) if fc<=0 else "+"+str(fc)
+        result[f"{atom.centerX},{atom.centerY}"]=info
+    return result
+
+
+def layOut(molecule,layouts=None,stats=None):
+    """assignPositions, unless layouts (layoutKey -> laid out molecule)
+    already has a structure with the same skeleton to copy from"""
+    if layouts is None:
+        molecule.assignPositions(1000,600,stats)
+        return
+    key=molecule.layoutKey()
+    laidOut=layouts.get(key)
+    if laidOut is None:
+        molecule.assignPositions(1000,600,stats)
+        layouts[key]=molecule
+        return
+    molecule.copyLayout(laidOut)
+    if stats is not None:
+        stats.count("layout.reused")
+
+
+def getMolecule(molecule,stats=None,layouts=None):
+    """gets all the positions of the atoms, bonds, and  lp's in the molecule.
+    resonance structures share their skeleton's layout through layouts"""
+    with phase(stats,"layout"):
+        layOut(molecule,layouts,stats)
+    atoms = {f"{atom.centerX},{atom.centerY}": 
+             atom.symbol for atom in molecule.atoms}
+    bonds=molecule.assignBonds()
+    lonePairs=molecule.getLonePairs()
+    atomsInfo=getAtomsInfo(molecule)
+    molInfo=getMoleculeInfo(molecule)
+    return {"atoms": atoms, "bonds": bonds,"lonePairs":lonePairs,
+            "atomsInfo":atomsInfo,"molInfo":molInfo}
+
+
+def enumerateMolecule(moleculeName,budget=None,fanOutWorkers=None,
+                      compact=False,stats=None,trees=False):
+    """finds the best structures and lays each of them out. only plain
+    dicts and strings come back, so the result pickles cheaply out of a
+    worker process"""
+    moleculeList=getBestStructures(moleculeName,budget,fanOutWorkers,compact,
+                                   stats,trees)
+    print("molecule received")
+    result={}
+    layouts={}
+    for index in range(len(moleculeList)):
+        result[str(index)]=getMolecule(moleculeList[index],stats,layouts)
+    return result
+
+
+def streamMolecule(moleculeName,budget=None,compact=False,trees=False):
+    """yields a message for every structure that ties or beats the best
+    score so far, already laid out, then a final message listing which of
+    them are the best structures"""
+    layouts={}
+    for index,item,score in iterBestStructures(moleculeName,budget,compact,
+                                               trees=trees):
+        if index is None:
+            yield {"type":"done","best":item,
+                   "truncated":bool(budget and budget.truncated)}
+        else:
+            yield {"type":"structure","index":index,"score":score,
+                   "structure":getMolecule(item,layouts=layouts)}
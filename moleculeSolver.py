@@ -4,40 +4,150 @@ from moleculeClass import*
 from tokenizer import*
 from backtracker import*
 from breadthFirst import*
+from parallelSolver import fanOutStructures
+from compactMolecule import CompactMolecule
+from treeSkeletons import iterTreeSkeletons, iterCompactTreeSkeletons
+from searchStats import phase, timed
+from canonicalForm import VisitedStates
 import time
-def getAllStructures(molecule):
+def getAllStructures(molecule,budget=None,stats=None):
     "takes all skeletal structures and finds solutions for them"
-    moleculeList=getSkeletalStructuresDFS(molecule)
+    with phase(stats,"skeletons"):
+        moleculeList=getSkeletalStructuresDFS(molecule,budget=budget,
+                                              stats=stats)
     print(len(moleculeList))
     validStructs=[]
     #default min score
     minScore=[float("inf")]
-    for molecule in moleculeList:
-        result=backtrackSkeletalStructure(molecule,[],[],[],minScore)
-        if result:
-           minScore=[result[1]]
-           validStructs+=result[0]
+    with phase(stats,"backtrack"):
+        for molecule in moleculeList:
+            result=backtrackSkeletalStructure(molecule,[],[],[],minScore)
+            if result:
+               minScore=[result[1]]
+               validStructs+=result[0]
     return validStructs
 
-def getAllStructures2(molecule):
-    moleculeList=getSkeletalStructuresDFS(molecule)
-    completeList=[]
-    minScore=[float('inf')]
-    for mol in moleculeList:
-        newMolecule=backtrackPiBondsLonePairs(mol,[],None,minScore,set())
-        minScore=newMolecule[1]
-        completeList+=newMolecule[0]
+def iterSkeletons(molecule,budget=None,stats=None,trees=False):
+    """the DFS's skeletal structures, or with trees iterTreeSkeletons'"""
+    if trees:
+        return iterTreeSkeletons(molecule,budget,stats)
+    return iterSkeletalStructuresDFS(molecule,budget=budget,stats=stats)
+
+def getAllStructures2(molecule,budget=None,workers=None,stats=None,
+                      trees=False):
+    """with workers, the skeletons are finished in that many processes,
+    giving exactly the same list as the serial loop"""
+    with phase(stats,"skeletons"):
+        moleculeList=list(iterSkeletons(molecule,budget,stats,trees))
+    with phase(stats,"backtrack"):
+        if workers and workers>1 and len(moleculeList)>1:
+            return fanOutStructures(moleculeList,workers,budget,stats)
+        completeList=[]
+        minScore=[float('inf')]
+        for mol in moleculeList:
+            if budget is not None and budget.shouldStop(completeList):
+                break
+            newMolecule=backtrackPiBondsLonePairs(mol,[],None,minScore,
+                                        VisitedStates(),budget,stats)
+            minScore=newMolecule[1]
+            completeList+=newMolecule[0]
     return completeList
         
-def getBestStructures(moleculeName):
+def iterStructures2(molecule,budget=None,stats=None,trees=False):
+    """yields complete structures in the same order getAllStructures2 lists
+    them, finishing each skeleton as soon as the DFS finds it"""
+    minScore=[float('inf')]
+    found=False
+    for mol in timed(stats,"skeletons",iterSkeletons(molecule,budget,stats,
+                                                     trees)):
+        if budget is not None and budget.shouldStop(found):
+            break
+        for structure in timed(stats,"backtrack",iterPiBondsLonePairs(mol,
+                                [],None,minScore,VisitedStates(),budget,
+                                stats)):
+            found=True
+            yield structure
+
+def iterCompactStructures(molecule,budget=None,stats=None,trees=False):
+    """iterStructures2 on CompactMolecule states, yields (score, state) for
+    every complete structure. state.toMolecule() gives the same molecule
+    iterStructures2 would have"""
+    minScore=[float('inf')]
+    found=False
+    if trees:
+        skeletons=iterCompactTreeSkeletons(molecule,budget,stats)
+    else:
+        skeletons=iterCompactSkeletons(CompactMolecule(molecule),
+                                       budget=budget,stats=stats)
+    for skeleton in timed(stats,"skeletons",skeletons):
+        if budget is not None and budget.shouldStop(found):
+            break
+        for structure in timed(stats,"backtrack",iterCompactPiBonds(skeleton,
+                                    [],None,minScore,VisitedStates(),budget,
+                                    stats)):
+            found=True
+            with phase(stats,"score"):
+                score=structure.getScore()
+            yield (score,structure)
+
+def iterBestStructures(moleculeName,budget=None,compact=False,stats=None,
+                       trees=False):
+    """streaming version of getBestStructures. yields (index, molecule,
+    score) for every structure that ties or beats the best score so far,
+    then (None, best indices, best score) once the search is over. the
+    best indices pick out the same molecules getBestStructures returns.
+    compact only builds molecules for the structures it yields, trees gets
+    the skeletons from iterTreeSkeletons"""
+    molecule=parseMolecule(moleculeName)
+    if compact and not molecule.expandedOctet:
+        scored=iterCompactStructures(molecule,budget,stats,trees)
+    else:
+        if molecule.expandedOctet:
+            structures=iter(getAllStructures(molecule,budget,stats))
+        else:
+            structures=iterStructures2(molecule,budget,stats,trees)
+        scored=((scoreStructure(structure,stats),structure) 
+                for structure in structures)
+    bestScore=float('inf')
+    emitted=[]
+    for score,structure in scored:
+        if score>bestScore or score>40:
+            continue
+        bestScore=score
+        emitted.append(score)
+        if compact and not molecule.expandedOctet:
+            structure=structure.toMolecule()
+        yield (len(emitted)-1,structure,score)
+    best=[index for index in range(len(emitted)) if emitted[index]==bestScore]
+    yield (None,best,bestScore)
+
+def scoreStructure(structure,stats=None):
+    with phase(stats,"score"):
+        return structure.getScore()
+
+def getBestStructures(moleculeName,budget=None,workers=None,compact=False,
+                      stats=None,trees=False):
     """sorts molecules based on score and returns a list of the lowest score
-    molecules"""
+    molecules. with a budget, the search stops early once it runs out and
+    budget.truncated says the list is only the best found so far.
+    compact searches CompactMolecule states, in this process, and only
+    builds the molecules that are returned. trees gets the skeletons from
+    iterTreeSkeletons, every isomer once, instead of the DFS"""
     print("getting structure")
     molecule=parseMolecule(moleculeName)
-    func=getAllStructures if molecule.expandedOctet else getAllStructures2
-    validStructures=func(molecule)
-    validStructures.sort(key=lambda molecule: molecule.getScore())
-    allBestStructs=[molecule for molecule in validStructures if
+    if compact and not molecule.expandedOctet:
+        scored=sorted(iterCompactStructures(molecule,budget,stats,trees),
+                      key=lambda item: item[0])
+        return [structure.toMolecule() for score,structure in scored
+                if score==scored[0][0] and score<=40]
+    if molecule.expandedOctet:
+        validStructures=getAllStructures(molecule,budget,stats)
+    else:
+        validStructures=getAllStructures2(molecule,budget,workers,stats,
+                                          trees)
+    with phase(stats,"score"):
+        validStructures.sort(key=lambda molecule: molecule.getScore())
+        allBestStructs=[molecule for molecule in validStructures if
                      (molecule.getScore()==validStructures[0].getScore() and 
                       molecule.getScore()<=40)]
     return allBestStructs
@@ -0,0 +1,156 @@
+"""spreads the pi bond/lone pair search over skeletons across processes"""
+import concurrent.futures
+import multiprocessing
+import threading
+from backtracker import backtrackPiBondsLonePairs
+from canonicalForm import VisitedStates
+from searchBudget import SearchBudget
+from searchStats import SearchStats
+
+#lowest formal charge sum any worker has finished with, and the flag that
+#tells the workers to give up, both set by initFanOut
+sharedMinScore=None
+cancelFlag=None
+
+#how long the caller waits on a worker between looks at its own budget
+POLL_SECONDS=0.05
+
+def initFanOut(value,flag):
+    global sharedMinScore,cancelFlag
+    sharedMinScore=value
+    cancelFlag=flag
+
+def backtrackSkeleton(skeleton,withStats=False,maxSeconds=None,
+                      maxStates=None):
+    """runs in a worker. the search is pruned with the best score any
+    worker has published so far, and that starting bound is sent back
+    along with the structures so the caller can check it. the worker stops
+    like the caller would, once what's left of the caller's budget runs out
+    or the caller raises cancelFlag"""
+    stats=SearchStats() if withStats else None
+    budget=SearchBudget(maxSeconds,maxStates,
+                        isCancelled=lambda: cancelFlag.value!=0)
+    startScore=sharedMinScore.value
+    minScore=[startScore]
+    moleculeList,minScore=backtrackPiBondsLonePairs(skeleton,[],None,
+                                        minScore,VisitedStates(),budget,stats)
+    with sharedMinScore.get_lock():
+        if minScore[0]<sharedMinScore.value:
+            sharedMinScore.value=minScore[0]
+    return (startScore,moleculeList,minScore[0],
+            stats.stats() if stats else None,budget.reason)
+
+
+class FanOutPool:
+    """a process pool kept between fan-outs, so only the first one pays
+    for starting the workers, and the shared values its workers were
+    started with"""
+    __slots__ = ["workers", "pool", "minScore", "cancel"]
+    def __init__(self,workers):
+        self.workers=workers
+        self.minScore=multiprocessing.Value("d",float('inf'))
+        self.cancel=multiprocessing.Value("b",0)
+        self.pool=concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+            initializer=initFanOut,initargs=(self.minScore,self.cancel))
+
+    def stop(self,wait=False):
+        """gives up on everything submitted. running workers see cancel and
+        unwind on their own, only waited for with wait"""
+        self.cancel.value=1
+        self.pool.shutdown(wait=wait,cancel_futures=True)
+
+fanOutPool=None
+#a FanOutPool runs one fan-out at a time
+fanOutLock=threading.Lock()
+
+def getFanOutPool(workers):
+    global fanOutPool
+    if fanOutPool is None or fanOutPool.workers!=workers:
+        if fanOutPool is not None:
+            fanOutPool.stop()
+        fanOutPool=FanOutPool(workers)
+    return fanOutPool
+
+def stopFanOut():
+    """stops this process's fan-out pool, if it started one, and waits for
+    its workers. a process that fans out has to do this before it exits,
+    they'd keep it from exiting otherwise"""
+    global fanOutPool
+    if fanOutPool is not None:
+        fanOutPool.stop(wait=True)
+        fanOutPool=None
+
+def workerLimits(budget):
+    """what's left of budget, as the maxSeconds and maxStates of a worker's
+    own budget"""
+    if budget is None:
+        return None,None
+    maxSeconds=maxStates=None
+    if budget.maxSeconds is not None:
+        maxSeconds=max(budget.maxSeconds-budget.elapsed(),0)
+    if budget.maxStates is not None:
+        maxStates=max(budget.maxStates-budget.states,0)
+    return maxSeconds,maxStates
+
+def waitForWorker(future,budget,found):
+    """the worker's result, or None if budget says to stop first. the
+    caller visits no states while it waits, so it looks at the clock and
+    the cancel flag itself"""
+    while True:
+        budget.check()
+        if budget.shouldStop(found):
+            return None
+        try:
+            return future.result(timeout=POLL_SECONDS)
+        except concurrent.futures.TimeoutError:
+            pass
+
+
+def fanOutStructures(skeletons,workers,budget=None,stats=None):
+    """same result as running backtrackPiBondsLonePairs on every skeleton in
+    order while carrying minScore along, but with the skeletons spread over
+    worker processes.
+
+    a skeleton's results only depend on the minScore it starts with. the
+    serial loop would start skeleton i with the lowest score found in
+    skeletons 0..i-1, so a worker's results are kept when it started from
+    exactly that score, and that skeleton is redone here otherwise. stats
+    counts the work of every worker, thrown away or not. a worker that runs
+    out of budget runs budget out too"""
+    global fanOutPool
+    completeList=[]
+    minScore=[float('inf')]
+    with fanOutLock:
+        fanOut=getFanOutPool(workers)
+        fanOut.minScore.value=float('inf')
+        fanOut.cancel.value=0
+        maxSeconds,maxStates=workerLimits(budget)
+        futures=[fanOut.pool.submit(backtrackSkeleton,skeleton,
+                                    stats is not None,maxSeconds,maxStates)
+                 for skeleton in skeletons]
+        stopped=False
+        for skeleton,future in zip(skeletons,futures):
+            if budget is None:
+                result=future.result()
+            else:
+                result=waitForWorker(future,budget,completeList)
+                if result is None:
+                    stopped=True
+                    break
+            startScore,moleculeList,endScore,workerStats,reason=result
+            if workerStats is not None:
+                stats.merge(workerStats)
+            if reason is not None and budget is not None:
+                budget.stop(reason)
+            if startScore==minScore[0]:
+                minScore=[endScore]
+            else:
+                if stats is not None:
+                    stats.count("fanOut.reruns")
+                moleculeList,minScore=backtrackPiBondsLonePairs(skeleton,[],
+                                None,minScore,VisitedStates(),budget,stats)
+            completeList+=moleculeList
+        if stopped:
+            fanOut.stop()
+            fanOutPool=None
+    return completeList
@@ -0,0 +1,50 @@
+"""properties of the elements lewis structures are drawn for. built once,
+atoms just keep a reference to their Element"""
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Element:
+    symbol: str
+    molarMass: float
+    valenceElectrons: int
+    #bonds it usually makes
+    prefBonds: int
+    atomicNumber: int
+    #could hold more than 8 electrons
+    canExpandOctet: bool
+    electroNegativity: float
+    #electrons it needs for a full shell
+    octetElectrons: int = 8
+
+
+ELEMENTS={}
+
+def addElement(symbol,molarMass,valenceElectrons,prefBonds,atomicNumber,
+               canExpandOctet,electroNegativity,octetElectrons=8):
+    """registers an element, so Atom(symbol) works for it"""
+    element=Element(symbol,molarMass,valenceElectrons,prefBonds,atomicNumber,
+                    canExpandOctet,electroNegativity,octetElectrons)
+    ELEMENTS[symbol]=element
+    return element
+
+
+addElement("H",  1.01, 1, 1, 1, False, 2.20, 2)
+addElement("C",  12.01, 4, 4, 6, False, 2.55)
+addElement("N",  14.01, 5, 3, 7, False, 3.04)
+addElement("O",  16.00, 6, 2, 8, False, 3.44)
+addElement("S",  32.07, 6, 2, 16, True, 2.58)
+addElement("F",  19.00, 7, 1, 9, False, 3.98)
+addElement("Cl", 34.45, 7, 1, 17, True, 3.16)
+addElement("Br", 79.70, 7, 1, 35, True, 2.96)
+addElement("P",  30.97, 5, 3, 15, True, 2.19)
+addElement("I",  126.90, 7, 1, 53, True, 2.66)
+addElement("He", 4.00, 8, 4, 2, False, 0.0)
+addElement("Ne", 20.18, 8, 4, 10, False, 0.0)
+addElement("Ar", 39.95, 8, 4, 18, True, 0.0)
+addElement("Kr", 83.80, 8, 4, 36, True, 3.0)  # approximate
+addElement("Xe", 131.29, 8, 4, 54, True, 2.6) # approximate
+addElement("B",  10.81, 3, 3, 5, False, 2.04, 6)
+addElement("Be", 9.01, 2, 2, 4, False, 1.57, 4)
+addElement("Si", 28.09, 4, 4, 14, True, 1.90)
+addElement("Al", 26.98, 3, 3, 13, True, 1.61, 6)
@@ -0,0 +1,240 @@
+"""process level cache of enumerated structures, backed by cache.json"""
+import json
+import os
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from tokenizer import keyFromUniqueString
+
+
+#what the cache file says its keys are, files without it are keyed by
+#uniqueString() and get migrated when they're loaded
+KEY_FORMAT="hill"
+
+
+#the process umask, read at import since reading it means setting it
+UMASK=os.umask(0)
+os.umask(UMASK)
+
+def fileMode(path):
+    """the permissions a file written over path should get: the old file's,
+    or what open() would give a new one. mkstemp makes its files 0600"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666&~UMASK
+
+
+#the cache file is written compactly, so maxBytes, which is checked against
+#entrySize, is about the size of the file
+SEPARATORS=(",",":")
+
+def entrySize(value):
+    """bytes value takes up in the cache file, near enough"""
+    return len(json.dumps(value,separators=SEPARATORS))
+
+
+def migrateEntries(data):
+    """the entries of a loaded cache file, with uniqueString() keys turned
+    into formulaKey ones if it's from before hill keys"""
+    if data.get("keyFormat")==KEY_FORMAT:
+        entries=data.get("entries")
+        return entries if isinstance(entries,dict) else {}
+    migrated={}
+    for key,value in data.items():
+        newKey=keyFromUniqueString(key)
+        if newKey is not None:
+            migrated[newKey]=value
+    return migrated
+
+
+class ResultCache:
+    """keeps cached results in memory and writes misses back to disk in
+    batches, so a request never has to read or rewrite the whole file.
+
+    with maxEntries or maxBytes the least recently used entries are evicted
+    once it grows past them, except for pinned keys, which stay no matter
+    what. the file only ever holds what's in memory, so it stays bounded
+    too"""
+
+    def __init__(self,path="cache.json",flushInterval=5.0,maxEntries=None,
+                 maxBytes=None):
+        self.path=path
+        self.flushInterval=flushInterval
+        self.maxEntries=maxEntries
+        self.maxBytes=maxBytes
+
+        #formulaKey(name) -> response for that molecule, least recently
+        #used first
+        self.entries=OrderedDict()
+        #key -> entrySize of its response
+        self.sizes={}
+        self.bytes=0
+        self.pinned=set()
+        self.lock=threading.Lock()
+
+        #set when entries has something that isn't on disk yet
+        self.dirty=False
+
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+        self.flushes=0
+
+        self.stopEvent=threading.Event()
+        self.flushThread=None
+
+    @classmethod
+    def fromEnvironment(cls,path="cache.json"):
+        """ISOMER_CACHE_MAX_ENTRIES and ISOMER_CACHE_MAX_BYTES cap the
+        cache, it's unbounded without them"""
+        def envInt(name):
+            value=os.environ.get(name)
+            return int(value) if value else None
+        return cls(path,maxEntries=envInt("ISOMER_CACHE_MAX_ENTRIES"),
+                   maxBytes=envInt("ISOMER_CACHE_MAX_BYTES"))
+
+    def load(self):
+        """reads the cache file once, a missing or broken file starts empty.
+        the file is in least recently used order, so the caps evict the
+        same entries they would have before the restart"""
+        try:
+            with open(self.path,"r") as f:
+                data=json.load(f)
+        except (OSError,ValueError):
+            data={}
+        if not isinstance(data,dict):
+            data={}
+        migrated=data.get("keyFormat")!=KEY_FORMAT
+        data=migrateEntries(data)
+        with self.lock:
+            self.entries=OrderedDict()
+            self.sizes={}
+            self.bytes=0
+            for key,value in data.items():
+                self.store(key,value)
+            #only dirty if the file is in the old format or the caps threw
+            #something away
+            self.dirty=self.evict()>0 or (migrated and bool(data))
+            return len(self.entries)
+
+    def pin(self,keys):
+        """keys that are never evicted, they don't have to be cached yet"""
+        with self.lock:
+            self.pinned.update(keys)
+
+    def get(self,key):
+        """returns the cached result for key or None"""
+        with self.lock:
+            result=self.entries.get(key)
+            if result is None:
+                self.misses+=1
+            else:
+                self.hits+=1
+                self.entries.move_to_end(key)
+            return result
+
+    def put(self,key,value):
+        """stores a result, it gets written to disk on the next flush"""
+        with self.lock:
+            self.store(key,value)
+            self.evict()
+            self.dirty=True
+
+    def store(self,key,value):
+        if key in self.entries:
+            self.bytes-=self.sizes[key]
+        self.entries[key]=value
+        self.entries.move_to_end(key)
+        self.sizes[key]=entrySize(value)
+        self.bytes+=self.sizes[key]
+
+    def overCapacity(self):
+        return ((self.maxEntries is not None and
+                 len(self.entries)>self.maxEntries) or
+                (self.maxBytes is not None and self.bytes>self.maxBytes))
+
+    def evict(self):
+        """drops least recently used unpinned entries until it's under the
+        caps or only pinned ones are left, returns how many it dropped"""
+        evicted=0
+        skipped=0
+        while self.overCapacity() and skipped<len(self.entries):
+            key=next(iter(self.entries))
+            if key in self.pinned:
+                self.entries.move_to_end(key)
+                skipped+=1
+                continue
+            del self.entries[key]
+            self.bytes-=self.sizes.pop(key)
+            evicted+=1
+        self.evictions+=evicted
+        return evicted
+
+    def __contains__(self,key):
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def flush(self):
+        """atomically rewrites the cache file if anything changed, returns
+        True if it wrote"""
+        with self.lock:
+            if not self.dirty:
+                return False
+            snapshot=dict(self.entries)
+            self.dirty=False
+        directory=os.path.dirname(os.path.abspath(self.path))
+        tmpPath=None
+        try:
+            #write next to the real file so os.replace never crosses devices
+            fd,tmpPath=tempfile.mkstemp(dir=directory,prefix=".cache-",
+                                        suffix=".json")
+            os.fchmod(fd,fileMode(self.path))
+            with os.fdopen(fd,"w") as f:
+                json.dump({"keyFormat":KEY_FORMAT,"entries":snapshot},f,
+                          separators=SEPARATORS)
+            os.replace(tmpPath,self.path)
+        except OSError:
+            #try again on the next flush
+            with self.lock:
+                self.dirty=True
+            if tmpPath and os.path.exists(tmpPath):
+                os.unlink(tmpPath)
+            return False
+        self.flushes+=1
+        return True
+
+    def flushLoop(self):
+        while not self.stopEvent.wait(self.flushInterval):
+            self.flush()
+
+    def start(self):
+        """loads the file and starts the background flusher"""
+        self.load()
+        self.stopEvent.clear()
+        self.flushThread=threading.Thread(target=self.flushLoop,
+                                          name="cache-flush",daemon=True)
+        self.flushThread.start()
+
+    def stop(self):
+        """stops the flusher and writes whatever is left"""
+        self.stopEvent.set()
+        if self.flushThread:
+            self.flushThread.join()
+            self.flushThread=None
+        self.flush()
+
+    def stats(self):
+        """hit/miss/eviction counters and how full it is"""
+        with self.lock:
+            return {"entries":len(self.entries),"bytes":self.bytes,
+                    "maxEntries":self.maxEntries,"maxBytes":self.maxBytes,
+                    "pinned":len(self.pinned.intersection(self.entries)),
+                    "hits":self.hits,"misses":self.misses,
+                    "evictions":self.evictions,"flushes":self.flushes,
+                    "dirty":self.dirty}
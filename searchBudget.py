@@ -0,0 +1,78 @@
+"""cooperative time and state limits for the enumerators"""
+import time
+
+
+class SearchBudget:
+    """the backtrackers call spend() once per state they visit. once the
+    budget runs out they unwind and keep what they've found so far"""
+
+    #how many states to visit between looking at the clock
+    checkEvery=128
+
+    def __init__(self,maxSeconds=None,maxStates=None,isCancelled=None,
+                 graceFactor=2.0):
+        self.maxSeconds=maxSeconds
+        self.maxStates=maxStates
+        #callable returning True once nobody wants the result anymore
+        self.isCancelled=isCancelled
+        #how far past maxSeconds the search may go while it still has
+        #nothing at all to return
+        self.graceFactor=graceFactor
+        self.startTime=time.monotonic()
+        self.states=0
+        self.exhausted=False
+        self.cancelled=False
+        self.reason=None
+
+    def spend(self):
+        """counts one visited state, returns False once the budget is gone"""
+        self.states+=1
+        if self.exhausted:
+            return False
+        if self.maxStates is not None and self.states>self.maxStates:
+            self.stop("states")
+        elif self.states%self.checkEvery==0:
+            self.check()
+        return not self.exhausted
+
+    def check(self):
+        if self.isCancelled is not None and self.isCancelled():
+            self.cancelled=True
+            self.stop("cancelled")
+        elif (self.maxSeconds is not None and
+              self.elapsed()>self.maxSeconds):
+            self.stop("time")
+        return not self.exhausted
+
+    def stop(self,reason):
+        if not self.exhausted:
+            self.exhausted=True
+            self.reason=reason
+
+    def shouldStop(self,found):
+        """True once the budget is gone and there is something to return,
+        or the search has overrun even its grace period"""
+        return self.exhausted and (bool(found) or self.overrun())
+
+    def overrun(self):
+        """True if the search has to stop even with nothing found"""
+        if self.states%self.checkEvery==0:
+            self.check()
+        if self.cancelled:
+            return True
+        if (self.maxStates is not None and
+            self.states>self.maxStates*self.graceFactor):
+            return True
+        return (self.maxSeconds is not None and
+                self.elapsed()>self.maxSeconds*self.graceFactor)
+
+    def elapsed(self):
+        return time.monotonic()-self.startTime
+
+    @property
+    def truncated(self):
+        return self.exhausted
+
+    def stats(self):
+        return {"states":self.states,"seconds":round(self.elapsed(),3),
+                "truncated":self.exhausted,"reason":self.reason}
@@ -0,0 +1,66 @@
+"""opt-in counters and phase timers for the searches and the layout"""
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+
+class SearchStats:
+    """passed down as stats=... next to the budget. every function that
+    takes one does nothing extra when it's None.
+
+    counters are named after where they happen, like "dfs.nodes",
+    "backtrack.visitedHits" or "dfs.prune.peroxide", and phases are
+    "skeletons", "backtrack", "score" and "layout" """
+
+    def __init__(self):
+        self.counts=Counter()
+        self.seconds=defaultdict(float)
+
+    def count(self,name,amount=1):
+        self.counts[name]+=amount
+
+    @contextmanager
+    def phase(self,name):
+        start=time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds[name]+=time.perf_counter()-start
+
+    def timed(self,name,iterator):
+        """yields what iterator does, only counting the time spent inside
+        it towards the phase, not the time the caller holds each item"""
+        iterator=iter(iterator)
+        while True:
+            start=time.perf_counter()
+            try:
+                item=next(iterator)
+            except StopIteration:
+                self.seconds[name]+=time.perf_counter()-start
+                return
+            self.seconds[name]+=time.perf_counter()-start
+            yield item
+
+    def merge(self,other):
+        """adds the counts and times of another SearchStats, or of its
+        stats() dict"""
+        if isinstance(other,SearchStats):
+            other=other.stats()
+        self.counts.update(other["counts"])
+        for name,seconds in other["seconds"].items():
+            self.seconds[name]+=seconds
+        return self
+
+    def stats(self):
+        return {"counts":dict(sorted(self.counts.items())),
+                "seconds":{name:round(seconds,4) for name,seconds in
+                           sorted(self.seconds.items())}}
+
+
+def phase(stats,name):
+    """stats.phase(name), or a context that does nothing without stats"""
+    return nullcontext() if stats is None else stats.phase(name)
+
+def timed(stats,name,iterator):
+    """stats.timed(name,iterator), or just iterator without stats"""
+    return iterator if stats is None else stats.timed(name,iterator)
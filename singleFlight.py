@@ -0,0 +1,54 @@
+"""collapses concurrent identical computations into one"""
+import asyncio
+
+
+class SingleFlight:
+    """registry of in flight computations keyed by formulaKey(name), the
+    key the caches use. the first caller for a key starts the work,
+    everyone else who asks for the same key while it's running awaits the
+    same task"""
+
+    def __init__(self):
+        #key -> [task, number of callers waiting on it]
+        self.inFlight={}
+        self.started=0
+        self.shared=0
+
+    async def run(self,key,factory):
+        """returns the result of factory() for key, only calling factory if
+        nothing is already computing that key"""
+        entry=self.inFlight.get(key)
+        if entry is None:
+            task=asyncio.ensure_future(factory())
+            entry=[task,0]
+            self.inFlight[key]=entry
+            task.add_done_callback(lambda _,key=key,entry=entry:
+                                   self.finished(key,entry))
+            self.started+=1
+        else:
+            self.shared+=1
+        entry[1]+=1
+        try:
+            #shield so one caller going away doesn't cancel the others
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            #the work is only cancelled once nobody is waiting on it anymore
+            if entry[1]==1 and not entry[0].done():
+                entry[0].cancel()
+                #the task only finishes on its next step, a caller that
+                #comes in before then starts over instead of joining it
+                self.finished(key,entry)
+            raise
+        finally:
+            entry[1]-=1
+
+    def finished(self,key,entry):
+        if self.inFlight.get(key) is entry:
+            del self.inFlight[key]
+
+    def __contains__(self,key):
+        return key in self.inFlight
+
+    def stats(self):
+        return {"inFlight":len(self.inFlight),"started":self.started,
+                "shared":self.shared}
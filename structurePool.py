@@ -0,0 +1,236 @@
+"""process pool that runs structure enumeration off the api's event loop"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import multiprocessing.util
+import os
+from moleculeResponse import enumerateMolecule, streamMolecule
+from parallelSolver import stopFanOut
+from searchBudget import SearchBudget
+from searchStats import SearchStats
+
+
+class PoolBusy(Exception):
+    """raised when every worker is busy and the wait queue is full"""
+
+
+#one flag per job slot, shared with every worker through initWorker
+cancelFlags=None
+
+def initWorker(flags):
+    global cancelFlags
+    cancelFlags=flags
+    #a job that fanned out leaves its fan-out pool running for the next one.
+    #it has to stop before the pool's queues close at exitpriority 10, or
+    #its workers never hear they should exit
+    multiprocessing.util.Finalize(None,stopFanOut,exitpriority=20)
+
+def warmWorker(_):
+    """imports everything and solves a tiny molecule so the first real
+    request doesn't pay for it"""
+    enumerateMolecule("H2O")
+    return os.getpid()
+
+def enumerateInWorker(moleculeName,slot,maxSeconds,maxStates,
+                      fanOutWorkers=None,compact=False,withStats=False,
+                      trees=False):
+    """runs inside a worker, the search stops once its budget runs out or
+    the api flips this job's cancel flag"""
+    budget=SearchBudget(maxSeconds,maxStates,
+                        isCancelled=lambda: cancelFlags[slot]!=0)
+    stats=SearchStats() if withStats else None
+    result=enumerateMolecule(moleculeName,budget,fanOutWorkers,compact,stats,
+                             trees)
+    if stats is not None:
+        stats=stats.stats()
+        stats["budget"]=budget.stats()
+    return (result,budget.truncated,stats)
+
+
+def streamInWorker(moleculeName,slot,maxSeconds,maxStates,queue,
+                   compact=False,trees=False):
+    """runs inside a worker, sends every streamed message back through
+    queue and always ends with None"""
+    budget=SearchBudget(maxSeconds,maxStates,
+                        isCancelled=lambda: cancelFlags[slot]!=0)
+    try:
+        for message in streamMolecule(moleculeName,budget,compact,trees):
+            queue.put(message)
+            if budget.cancelled:
+                break
+    except Exception as error:
+        queue.put({"type":"error","error":str(error)})
+    finally:
+        queue.put(None)
+
+
+def fanOutLimit(fanOutWorkers,maxWorkers,maxProcesses):
+    """fan-out workers a job gets, so that every worker fanning out at once
+    still runs at most maxProcesses of them. None, no fan-out, when that
+    leaves fewer than 2"""
+    if not fanOutWorkers:
+        return None
+    workers=min(fanOutWorkers,maxProcesses//maxWorkers)
+    return workers if workers>1 else None
+
+def envNumber(name,default,cast=int):
+    value=os.environ.get(name)
+    return cast(value) if value else default
+
+
+class StructurePool:
+    """a ProcessPoolExecutor with a bound on how much work can pile up"""
+
+    def __init__(self,maxWorkers=None,maxQueue=None,maxSeconds=None,
+                 maxStates=None,fanOutWorkers=None,compact=False,
+                 trees=False,maxProcesses=None):
+        self.maxWorkers=maxWorkers or os.cpu_count() or 1
+        #fan-out processes allowed across all the workers together
+        self.maxProcesses=maxProcesses or os.cpu_count() or 1
+        #jobs allowed to wait for a free worker on top of the running ones
+        self.maxQueue=self.maxWorkers*2 if maxQueue is None else maxQueue
+        #budget every enumeration gets
+        self.maxSeconds=maxSeconds
+        self.maxStates=maxStates
+        #processes each job may spread its skeletons over, off by default
+        self.fanOutWorkers=fanOutLimit(fanOutWorkers,self.maxWorkers,
+                                       self.maxProcesses)
+        #search CompactMolecule states instead of Molecules
+        self.compact=compact
+        #skeletons from iterTreeSkeletons instead of the DFS
+        self.trees=trees
+        self.executor=None
+        #only started once something streams
+        self.manager=None
+        self.cancelFlags=None
+        self.freeSlots=[]
+        self.pending=0
+        self.completed=0
+        self.rejected=0
+        self.cancelled=0
+        self.truncated=0
+
+    @classmethod
+    def fromEnvironment(cls):
+        """ISOMER_WORKERS, ISOMER_MAX_QUEUE, ISOMER_MAX_SECONDS,
+        ISOMER_MAX_STATES, ISOMER_FANOUT_WORKERS, ISOMER_COMPACT,
+        ISOMER_TREES and ISOMER_MAX_PROCESSES configure the pool"""
+        return cls(envNumber("ISOMER_WORKERS",None),
+                   envNumber("ISOMER_MAX_QUEUE",None),
+                   envNumber("ISOMER_MAX_SECONDS",30.0,float),
+                   envNumber("ISOMER_MAX_STATES",None),
+                   envNumber("ISOMER_FANOUT_WORKERS",None),
+                   bool(envNumber("ISOMER_COMPACT",0)),
+                   bool(envNumber("ISOMER_TREES",0)),
+                   envNumber("ISOMER_MAX_PROCESSES",None))
+
+    def start(self,warm=True):
+        #a job keeps its slot until its process is really done with it, so
+        #there is never more than capacity() of them
+        self.cancelFlags=multiprocessing.Array("b",self.capacity(),lock=False)
+        self.freeSlots=list(range(self.capacity()))
+        self.executor=concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.maxWorkers,initializer=initWorker,
+            initargs=(self.cancelFlags,))
+        if warm:
+            #one warm up job per worker forces every process to start
+            list(self.executor.map(warmWorker,range(self.maxWorkers)))
+        return self
+
+    def stop(self):
+        if self.executor:
+            for slot in range(self.capacity()):
+                self.cancelFlags[slot]=1
+            self.executor.shutdown(wait=False,cancel_futures=True)
+            self.executor=None
+        if self.manager:
+            self.manager.shutdown()
+            self.manager=None
+
+    def capacity(self):
+        return self.maxWorkers+self.maxQueue
+
+    def release(self,slot):
+        self.cancelFlags[slot]=0
+        self.freeSlots.append(slot)
+        self.pending-=1
+        self.completed+=1
+
+    def hasCapacity(self):
+        return bool(self.freeSlots)
+
+    def acquire(self):
+        """takes a job slot, raises PoolBusy if there are none left"""
+        if not self.freeSlots:
+            self.rejected+=1
+            raise PoolBusy(f"{self.pending} structure jobs already pending")
+        self.pending+=1
+        return self.freeSlots.pop()
+
+    def submit(self,slot,func,*args):
+        loop=asyncio.get_running_loop()
+        future=self.executor.submit(func,*args)
+        #the slot is only reused once the worker has actually let go of it
+        def releaseLater(_):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self.release,slot)
+        future.add_done_callback(releaseLater)
+        return future
+
+    def cancel(self,slot,future):
+        """stops a job whether it's still queued or already running"""
+        self.cancelled+=1
+        self.cancelFlags[slot]=1
+        return future.cancel()
+
+    async def enumerate(self,moleculeName,withStats=False):
+        """best structures of a molecule, already laid out as json, whether
+        the budget cut the search short, and SearchStats.stats() if
+        withStats (None otherwise). raises PoolBusy instead of queueing past
+        capacity"""
+        slot=self.acquire()
+        future=self.submit(slot,enumerateInWorker,moleculeName,slot,
+                    self.maxSeconds,self.maxStates,self.fanOutWorkers,
+                    self.compact,withStats,self.trees)
+        try:
+            result,truncated,stats=await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            #nobody wants this anymore
+            self.cancel(slot,future)
+            raise
+        if truncated:
+            self.truncated+=1
+        return (result,truncated,stats)
+
+    async def stream(self,moleculeName):
+        """async generator of the messages from moleculeResponse's
+        streamMolecule, as the worker produces them"""
+        slot=self.acquire()
+        if self.manager is None:
+            self.manager=multiprocessing.Manager()
+        queue=self.manager.Queue()
+        future=self.submit(slot,streamInWorker,moleculeName,slot,
+                           self.maxSeconds,self.maxStates,queue,self.compact,
+                           self.trees)
+        finished=False
+        try:
+            while True:
+                message=await asyncio.to_thread(queue.get)
+                if message is None:
+                    finished=True
+                    return
+                if message.get("type")=="done" and message["truncated"]:
+                    self.truncated+=1
+                yield message
+        finally:
+            if not finished and self.cancel(slot,future):
+                #it never started, so nothing else will end the queue
+                queue.put(None)
+
+    def stats(self):
+        return {"workers":self.maxWorkers,"maxQueue":self.maxQueue,
+                "pending":self.pending,"completed":self.completed,
+                "rejected":self.rejected,"cancelled":self.cancelled,
+                "truncated":self.truncated,"compact":self.compact,
+                "fanOutWorkers":self.fanOutWorkers,
+                "trees":self.trees}
@@ -0,0 +1,236 @@
+"""read only sqlite store of precomputed responses, built offline by
+
+    python structureStore.py --out structures.db --names top.txt
+
+which enumerates commonNames and every formula in top.txt (one per line,
+anything after a tab ignored, so "formula<TAB>count" log dumps work as
+is) in parallel, and swaps the new file in atomically"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from moleculeResponse import enumerateMolecule
+from searchBudget import SearchBudget
+from tokenizer import commonNames, formulaKey, parseComposition
+from resultCache import KEY_FORMAT, fileMode, migrateEntries
+
+
+SCHEMA="""
+create table structures (key text primary key, result text not null)
+    without rowid;
+create table meta (name text primary key, value text not null);
+"""
+
+
+class StructureStore:
+    """answers lookups from a store built by build(). the file is opened
+    read only, a missing or broken one just never hits"""
+
+    def __init__(self,path="structures.db"):
+        self.path=path
+        self.connection=None
+        #stores built before hill keys are keyed by uniqueString()
+        self.legacyKeys=False
+        self.lock=threading.Lock()
+        self.entries=0
+        self.hits=0
+        self.misses=0
+
+    def open(self):
+        """returns the number of stored results"""
+        self.close()
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            #immutable skips locking, the file is only ever replaced whole
+            connection=sqlite3.connect(
+                "file:"+os.path.abspath(self.path)+"?mode=ro&immutable=1",
+                uri=True,check_same_thread=False)
+            entries=connection.execute(
+                "select count(*) from structures").fetchone()[0]
+            keyFormat=connection.execute(
+                "select value from meta where name='keyFormat'").fetchone()
+        except sqlite3.Error:
+            return 0
+        with self.lock:
+            self.connection=connection
+            self.legacyKeys=keyFormat is None or keyFormat[0]!=KEY_FORMAT
+            self.entries=entries
+        return entries
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection=None
+                self.entries=0
+
+    def storedKey(self,key):
+        if not self.legacyKeys:
+            return key
+        try:
+            return parseComposition(key).uniqueString
+        except Exception:
+            return key
+
+    def get(self,key):
+        """returns the stored result for key or None"""
+        key=self.storedKey(key)
+        with self.lock:
+            if self.connection is None:
+                return None
+            row=self.connection.execute(
+                "select result from structures where key=?",(key,)).fetchone()
+            if row is None:
+                self.misses+=1
+                return None
+            self.hits+=1
+        return json.loads(row[0])
+
+    def __contains__(self,key):
+        key=self.storedKey(key)
+        with self.lock:
+            return self.connection is not None and self.connection.execute(
+                "select 1 from structures where key=?",(key,)).fetchone(
+                ) is not None
+
+    def __len__(self):
+        return self.entries
+
+    def stats(self):
+        with self.lock:
+            return {"path":self.path,"open":self.connection is not None,
+                    "entries":self.entries,"hits":self.hits,
+                    "misses":self.misses}
+
+
+def build(path,entries,meta=None):
+    """writes entries, a dict of key -> result, as a new store at path.
+    it's built next to path and renamed over it, so a server that has the
+    old one open keeps reading the old one until it reopens"""
+    directory=os.path.dirname(os.path.abspath(path))
+    fd,tmpPath=tempfile.mkstemp(dir=directory,prefix=".structures-",
+                                suffix=".db")
+    os.fchmod(fd,fileMode(path))
+    os.close(fd)
+    try:
+        connection=sqlite3.connect(tmpPath)
+        with connection:
+            connection.executescript(SCHEMA)
+            connection.executemany("insert into structures values (?,?)",
+                ((key,json.dumps(result,separators=(",",":")))
+                 for key,result in sorted(entries.items())))
+            meta=dict(meta or {},keyFormat=KEY_FORMAT)
+            connection.executemany("insert into meta values (?,?)",
+                ((name,str(value)) for name,value in meta.items()))
+        connection.execute("vacuum")
+        connection.close()
+        os.replace(tmpPath,path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.unlink(tmpPath)
+        raise
+    return len(entries)
+
+
+def readNames(path,top=None):
+    """formulas from a file, one per line, blank lines and #comments
+    skipped. top keeps only the first that many"""
+    names=[]
+    with open(path) as file:
+        for line in file:
+            line=line.strip()
+            if line and not line.startswith("#"):
+                names.append(line.split("\t")[0].strip())
+    return names[:top] if top else names
+
+def uniqueKeys(names):
+    """key -> first name for it, dropping names that don't parse and
+    names that are the same molecule as an earlier one"""
+    keys={}
+    for name in names:
+        try:
+            key=formulaKey(name)
+        except Exception:
+            print("skipping",name,file=sys.stderr)
+            continue
+        keys.setdefault(key,name)
+    return keys
+
+def warmOne(moleculeName,maxSeconds,compact,trees):
+    budget=SearchBudget(maxSeconds)
+    result=enumerateMolecule(moleculeName,budget,compact=compact,trees=trees)
+    return (result,budget.truncated)
+
+def warm(names,workers=None,maxSeconds=None,compact=False,trees=False):
+    """enumerates every name in a process pool, returns key -> result for
+    the ones that finished. truncated searches are left out, the api
+    searches those itself like it would without a store"""
+    keys=uniqueKeys(names)
+    entries={}
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures={executor.submit(warmOne,name,maxSeconds,compact,trees):key
+                 for key,name in keys.items()}
+        for future in concurrent.futures.as_completed(futures):
+            key=futures[future]
+            try:
+                result,truncated=future.result()
+            except Exception as error:
+                print(keys[key],"failed:",repr(error),file=sys.stderr)
+                continue
+            if truncated:
+                print(keys[key],"truncated, not stored",file=sys.stderr)
+                continue
+            entries[key]=result
+    return entries
+
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out",default="structures.db")
+    parser.add_argument("--names",help="file of extra formulas to warm")
+    parser.add_argument("--top",type=int,
+                        help="only the first that many from --names")
+    parser.add_argument("--no-common",action="store_true",
+                        help="leave out the commonNames table")
+    parser.add_argument("--cache",help="also copy the entries of a "
+                        "cache.json, for the keys nothing else computed")
+    parser.add_argument("--workers",type=int)
+    parser.add_argument("--max-seconds",type=float,default=300.0,
+                        help="search budget per molecule")
+    parser.add_argument("--compact",action="store_true",
+                        help="use the CompactMolecule engine")
+    parser.add_argument("--trees",action="store_true",
+                        help="get skeletons from iterTreeSkeletons")
+    args=parser.parse_args(argv)
+
+    names=[] if args.no_common else list(commonNames)
+    if args.names:
+        names+=readNames(args.names,args.top)
+    start=time.time()
+    entries=warm(names,args.workers,args.max_seconds,args.compact,
+                 args.trees)
+    if args.cache:
+        try:
+            with open(args.cache) as file:
+                cached=json.load(file)
+        except (OSError,ValueError) as error:
+            print("can't read",args.cache,repr(error),file=sys.stderr)
+            cached={}
+        if isinstance(cached,dict):
+            cached=migrateEntries(cached)
+            for key,result in cached.items():
+                entries.setdefault(key,result)
+    build(args.out,entries,{"builtAt":time.time(),"names":len(names),
+                            "seconds":round(time.time()-start,2)})
+    print("stored",len(entries),"results in",args.out,file=sys.stderr)
+    return 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
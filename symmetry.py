@@ -0,0 +1,121 @@
+"""which bonds of a structure are the same bond up to symmetry, so the pi
+bond search only has to try one of them, and which halves of a structure
+are the same, for its polarity.
+
+skeletons are trees, and in a tree two bonds are swapped by some automorphism
+exactly when they have the same order and the two halves the bond splits the
+tree into are the same rooted trees. halves are given canonical ids bottom up
+(the AHU algorithm, with the ids interned instead of spelled out as strings),
+so the classes are exact, not hashes that could merge two bonds that only
+look alike.
+
+hydrogens are always leaves, so for the pi bond search they're left out of
+the tree and counted in the label of the atom they're on"""
+
+
+def treeHalves(labels,neighbors):
+    """a function giving the id of the tree hanging from atom, away from
+    parent. two halves get the same id exactly when they're the same rooted
+    tree. labels[atom] is any hashable label, neighbors[atom] the (other
+    atom, bond label) pairs. every half is worked out once, so asking for
+    all of them is one pass over the tree"""
+    ids={}
+    halves={}
+    def half(atom,parent):
+        key=(atom,parent)
+        code=halves.get(key)
+        if code is None:
+            shape=(labels[atom],tuple(sorted(
+                (bond,half(other,atom)) for other,bond in neighbors[atom]
+                if other!=parent)))
+            code=halves[key]=ids.setdefault(shape,len(ids))
+        return code
+    return half
+
+def edgeClasses(labels,neighbors,edges):
+    """a class id per edge in edges, the same for two edges exactly when an
+    automorphism of the tree maps one onto the other"""
+    half=treeHalves(labels,neighbors)
+    ids={}
+    classes=[]
+    for one,two,bond in edges:
+        sides=sorted((half(one,two),half(two,one)))
+        classes.append(ids.setdefault((bond,sides[0],sides[1]),len(ids)))
+    return classes
+
+def repeated(classes):
+    """whether any class comes up more than once"""
+    return len(set(classes))<len(classes)
+
+
+def moleculeTree(structure):
+    """labels and neighbors of a Molecule's heavy atoms, for edgeClasses"""
+    index={}
+    for atom in structure.atoms:
+        if atom.symbol!="H":
+            index[atom]=len(index)
+    labels=[None]*len(index)
+    neighbors=[[] for _ in index]
+    for atom,position in index.items():
+        hydrogens=0
+        lonePairs=0
+        for domain in atom.electronDomains:
+            if domain==":":
+                lonePairs+=1
+                continue
+            other=domain.getOther(atom)
+            if other.symbol=="H":
+                hydrogens+=1
+            else:
+                neighbors[position].append((index[other],domain.electrons))
+        labels[position]=(atom.symbol,hydrogens,lonePairs)
+    return index,labels,neighbors
+
+def bondClasses(structure,bonds):
+    """edgeClasses of a Molecule's bonds, none of them to a hydrogen"""
+    index,labels,neighbors=moleculeTree(structure)
+    return edgeClasses(labels,neighbors,
+                       [(index[bond.atomOne],index[bond.atomTwo],
+                         bond.electrons) for bond in bonds])
+
+def compactBondClasses(state,bonds):
+    """edgeClasses of a CompactMolecule's bonds, (atom, atom) pairs none of
+    them to a hydrogen"""
+    symbols=state.symbols
+    order=state.order
+    numAtoms=state.numAtoms
+    labels=[None]*numAtoms
+    neighbors=[[] for _ in range(numAtoms)]
+    for atom in range(numAtoms):
+        hydrogens=0
+        for other in state.neighbors[atom]:
+            if symbols[other]=="H":
+                hydrogens+=1
+            else:
+                neighbors[atom].append((other,order[atom*numAtoms+other]))
+        labels[atom]=(symbols[atom],hydrogens,state.lonePairs[atom])
+    return edgeClasses(labels,neighbors,
+                       [(one,two,order[one*numAtoms+two])
+                        for one,two in bonds])
+
+def polarityHalves(structure):
+    """treeHalves over every atom of a Molecule, hydrogens included and
+    bond types left out like the polarity check wants, and the atom ->
+    index map it's keyed by. None if the molecule isn't a tree"""
+    index={atom:position for position,atom in enumerate(structure.atoms)}
+    neighbors=[[(index[domain.getOther(atom)],None)
+                for domain in atom.electronDomains if domain!=":"]
+               for atom in structure.atoms]
+    if sum(map(len,neighbors))!=2*(len(index)-1):
+        return None
+    seen={0}
+    queue=[0]
+    for atom in queue:
+        for other,_ in neighbors[atom]:
+            if other not in seen:
+                seen.add(other)
+                queue.append(other)
+    if len(seen)!=len(index):
+        return None
+    return index,treeHalves([atom.symbol for atom in structure.atoms],
+                            neighbors)
@@ -0,0 +1,92 @@
+"""canonical codes: the same for relabelled graphs, different for anything
+else, so the visited sets count isomers exactly"""
+import random
+from canonicalForm import VisitedStates, canonicalCode, moleculeGraph
+from tokenizer import parseMolecule
+from treeSkeletons import iterTreeSkeletons
+
+
+def codeOf(edges,labels,ids,bondLabel=1):
+    neighbors=[[] for _ in labels]
+    for one,two in edges:
+        neighbors[one].append((two,bondLabel))
+        neighbors[two].append((one,bondLabel))
+    return canonicalCode(labels,[tuple(sorted(bonded)) for bonded in
+                                 neighbors],(),ids)
+
+def relabelled(edges,labels,rng):
+    order=list(range(len(labels)))
+    rng.shuffle(order)
+    newLabels=[None]*len(labels)
+    for atom,label in enumerate(labels):
+        newLabels[order[atom]]=label
+    return [(order[one],order[two]) for one,two in edges],newLabels
+
+def ring(numAtoms,start=0):
+    return [(start+atom,start+(atom+1)%numAtoms) for atom in range(numAtoms)]
+
+
+def test_relabellingKeepsTheCode():
+    rng=random.Random(5)
+    graphs=[
+        #a tree whose center is a bond
+        ([(0,1),(1,2),(2,3),(3,4),(4,5)],["C"]*6),
+        ([(0,1),(0,2),(0,3),(3,4)],["C","O","C","N","C"]),
+        (ring(6),["C"]*6),
+        (ring(5)+[(0,5),(5,6)],["C","C","O","C","C","C","N"]),
+        #two pieces, one of them a tree
+        (ring(3)+[(3,4)],["C"]*5),
+    ]
+    for edges,labels in graphs:
+        ids={}
+        code=codeOf(edges,labels,ids)
+        for _ in range(20):
+            assert codeOf(*relabelled(edges,labels,rng),ids)==code
+
+def test_differentGraphsDifferentCodes():
+    ids={}
+    #colour refinement alone can't tell these apart, every atom has two
+    #neighbours in both
+    assert codeOf(ring(6),["C"]*6,ids)!=codeOf(ring(3)+ring(3,3),["C"]*6,
+                                                ids)
+    #same degrees, the branches in different places
+    assert (codeOf([(0,1),(1,2),(2,3),(1,4),(3,5)],["C"]*6,ids)!=
+            codeOf([(0,1),(1,2),(2,3),(1,4),(1,5)],["C"]*6,ids))
+    assert (codeOf([(0,1),(1,2)],["C","O","C"],ids)!=
+            codeOf([(0,1),(1,2)],["O","C","C"],ids))
+    assert (codeOf([(0,1)],["C","C"],ids,1)!=
+            codeOf([(0,1)],["C","C"],ids,2))
+
+def test_isomerCounts():
+    """every skeleton the tree generator gives is a different isomer, and
+    there are as many as there should be"""
+    for formula,isomers in (("C6H14",5),("C8H18",18),("C10H22",75),
+                            ("C3H6O",20),("C4H8O2",241)):
+        skeletons=list(iterTreeSkeletons(parseMolecule(formula)))
+        visited=VisitedStates()
+        assert sum(visited.visit(moleculeGraph(skeleton))
+                   for skeleton in skeletons)==isomers
+        assert len(skeletons)==isomers
+        assert len(visited)==isomers
+
+def test_visitedStatesSeesRelabelledMolecules():
+    """the same skeleton built with its atoms bonded in another order"""
+    rng=random.Random(2)
+    skeleton=next(iterTreeSkeletons(parseMolecule("C4H10")))
+    bonds=[(skeleton.atoms.index(bond.atomOne),
+            skeleton.atoms.index(bond.atomTwo))
+           for bond in skeleton.getBondList()]
+    visited=VisitedStates()
+    assert visited.visit(moleculeGraph(skeleton))
+    for _ in range(10):
+        molecule=parseMolecule("C4H10")
+        carbons=[atom for atom in molecule.atoms if atom.symbol=="C"]
+        hydrogens=[atom for atom in molecule.atoms if atom.symbol=="H"]
+        rng.shuffle(carbons)
+        rng.shuffle(hydrogens)
+        atoms=iter(carbons),iter(hydrogens)
+        newAtoms=[next(atoms[atom.symbol=="H"]) for atom in skeleton.atoms]
+        for one,two in bonds:
+            assert newAtoms[one].sigmaBond(newAtoms[two])
+        assert not visited.visit(moleculeGraph(molecule))
+    assert len(visited)==1
@@ -0,0 +1,28 @@
+"""cloneMolecule: the same molecule, sharing nothing with the original"""
+from canonicalForm import canonicalCode, moleculeGraph
+from moleculeSolver import getBestStructures
+
+
+def describe(molecule,ids):
+    return (canonicalCode(*moleculeGraph(molecule),ids),molecule.molToStr(),
+            molecule.getScore(),molecule.currentElectrons,
+            molecule.formalChargeSum,molecule.isComplete(),
+            sorted(bond.type for bond in molecule.getBondList()),
+            sorted(atom.electronDomains.count(":")
+                   for atom in molecule.atoms))
+
+def test_cloneIsAnIndependentCopy():
+    ids={}
+    for name in ("nitric acid","acetic acid","CO3^2-","NH4^+","HCN"):
+        for structure in getBestStructures(name):
+            before=describe(structure,ids)
+            clone=structure.cloneMolecule()
+            assert describe(clone,ids)==before
+            assert not set(map(id,clone.atoms))&set(map(id,structure.atoms))
+            assert not (set(map(id,clone.getBondList()))&
+                        set(map(id,structure.getBondList())))
+            #taking the clone apart leaves the original as it was
+            for bond in clone.getBondList():
+                bond.removePi()
+            clone.removeAllLonePairs()
+            assert describe(structure,ids)==before
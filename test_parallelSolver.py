@@ -0,0 +1,78 @@
+"""the fan-out: same structures as the serial loop, stopping on budget, and
+never keeping a process from exiting"""
+import os
+import subprocess
+import sys
+import time
+from canonicalForm import canonicalCode, moleculeGraph
+from moleculeSolver import getBestStructures
+from searchBudget import SearchBudget
+from structurePool import fanOutLimit
+
+
+def codes(structures,ids):
+    return sorted(canonicalCode(*moleculeGraph(structure),ids)
+                  for structure in structures)
+
+def test_sameAsSerial():
+    for name in ("acetic acid","C3H6O","nitric acid"):
+        ids={}
+        assert (codes(getBestStructures(name,workers=2),ids)==
+                codes(getBestStructures(name),ids))
+
+def test_budgetStopsWorkers():
+    budget=SearchBudget(0.5)
+    start=time.perf_counter()
+    getBestStructures("maleic acid",budget,workers=2)
+    assert time.perf_counter()-start<5
+    assert budget.truncated
+
+def test_fanOutLimit():
+    assert fanOutLimit(None,4,16) is None
+    assert fanOutLimit(4,2,16)==4
+    #4 workers each fanning out to 4 would be 16 processes
+    assert fanOutLimit(4,4,8)==2
+    assert fanOutLimit(4,4,4) is None
+
+
+#a pool worker that fanned out, stopped. the script has to exit
+STOP_SCRIPT="""
+import asyncio
+from structurePool import StructurePool
+
+def descendants(pid):
+    children={}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as file:
+                    parent=int(file.read().rsplit(")",1)[1].split()[1])
+            except OSError:
+                continue
+            children.setdefault(parent,[]).append(int(entry))
+    found=[]
+    stack=[pid]
+    while stack:
+        for child in children.get(stack.pop(),[]):
+            found.append(child)
+            stack.append(child)
+    return found
+
+async def main():
+    pool=StructurePool(maxWorkers=2,fanOutWorkers=2,maxProcesses=4).start()
+    await pool.enumerate("acetic acid")
+    print(len(descendants(os.getpid())),flush=True)
+    pool.stop()
+
+asyncio.run(main())
+"""
+
+def test_stoppedPoolExits():
+    if not os.path.isdir("/proc"):
+        return
+    result=subprocess.run([sys.executable,"-c","import os\n"+STOP_SCRIPT],
+                          capture_output=True,text=True,timeout=60,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode==0,result.stderr
+    #2 pool workers, and 2 fan-out workers for the one that fanned out
+    assert int(result.stdout.split()[-1])>=4
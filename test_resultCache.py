@@ -0,0 +1,121 @@
+"""ResultCache eviction, byte accounting and loading old cache files"""
+import json
+import os
+from resultCache import KEY_FORMAT, ResultCache, entrySize
+
+
+def test_getRefreshesRecency(tmp_path):
+    cache=ResultCache(str(tmp_path/"cache.json"),maxEntries=2)
+    cache.put("H2O",{"0":"water"})
+    cache.put("CH4",{"0":"methane"})
+    assert cache.get("H2O")=={"0":"water"}
+    cache.put("NH3",{"0":"ammonia"})
+    #CH4 was the least recently used once H2O was read
+    assert "CH4" not in cache
+    assert "H2O" in cache and "NH3" in cache
+    assert list(cache.entries)==["H2O","NH3"]
+    assert cache.stats()["evictions"]==1
+
+def test_missesDontChangeOrder(tmp_path):
+    cache=ResultCache(str(tmp_path/"cache.json"),maxEntries=2)
+    cache.put("H2O",{})
+    cache.put("CH4",{})
+    assert cache.get("NH3") is None
+    cache.put("NH3",{})
+    assert list(cache.entries)==["CH4","NH3"]
+    assert cache.stats()["misses"]==1
+
+def test_pinnedSurviveMaxEntries(tmp_path):
+    cache=ResultCache(str(tmp_path/"cache.json"),maxEntries=3)
+    cache.pin({"H2O","CH4"})
+    for key in ("H2O","CH4","NH3","CO2"):
+        cache.put(key,{"key":key})
+    assert "H2O" in cache and "CH4" in cache
+    assert "NH3" not in cache
+    assert "CO2" in cache
+
+def test_onlyPinnedLeftCanGoOverTheCap(tmp_path):
+    cache=ResultCache(str(tmp_path/"cache.json"),maxEntries=1)
+    cache.pin({"H2O","CH4"})
+    cache.put("H2O",{})
+    cache.put("CH4",{})
+    assert len(cache)==2
+
+def test_pinnedSurviveMaxBytes(tmp_path):
+    big={"0":"x"*100}
+    cache=ResultCache(str(tmp_path/"cache.json"),
+                      maxBytes=entrySize(big)*2)
+    cache.pin({"H2O"})
+    for key in ("H2O","CH4","NH3","CO2"):
+        cache.put(key,big)
+    assert list(cache.entries)==["H2O","CO2"]
+    assert cache.bytes<=cache.maxBytes
+
+def test_overwriteKeepsBytes(tmp_path):
+    cache=ResultCache(str(tmp_path/"cache.json"))
+    small={"0":"a"}
+    big={"0":"a"*50}
+    cache.put("H2O",small)
+    cache.put("CH4",small)
+    cache.put("H2O",big)
+    assert cache.bytes==entrySize(big)+entrySize(small)
+    cache.put("H2O",small)
+    assert cache.bytes==2*entrySize(small)
+    assert cache.bytes==sum(cache.sizes.values())
+
+def test_loadLegacyFile(tmp_path):
+    """a file keyed by uniqueString() from before hill keys is read with
+    hill keys and written back in the new format"""
+    path=tmp_path/"cache.json"
+    path.write_text(json.dumps({"HHHHCCOO0":{"0":"acetic"},
+                                "HHO0":{"0":"water"},
+                                "HHHHN1":{"0":"ammonium"},
+                                "not a key":{"0":"dropped"}}))
+    cache=ResultCache(str(path))
+    assert cache.load()==3
+    assert cache.get("C2H4O2")=={"0":"acetic"}
+    assert cache.get("H2O")=={"0":"water"}
+    assert cache.get("H4N^+")=={"0":"ammonium"}
+    assert cache.bytes==sum(entrySize(value) for value in
+                            cache.entries.values())
+    assert cache.flush()
+    written=json.loads(path.read_text())
+    assert written["keyFormat"]==KEY_FORMAT
+    assert set(written["entries"])=={"C2H4O2","H2O","H4N^+"}
+    #the file is written the way entrySize measures it
+    assert path.stat().st_size<=cache.bytes+100
+
+def test_loadCurrentFileKeepsOrder(tmp_path):
+    path=tmp_path/"cache.json"
+    cache=ResultCache(str(path))
+    for key in ("H2O","CH4","NH3"):
+        cache.put(key,{"key":key})
+    cache.get("H2O")
+    assert cache.flush()
+    again=ResultCache(str(path),maxEntries=2)
+    assert again.load()==2
+    #CH4 was least recently used when the file was written
+    assert list(again.entries)==["NH3","H2O"]
+    #the cap threw CH4 away, so the file needs writing again
+    assert again.dirty
+
+def test_brokenFileStartsEmpty(tmp_path):
+    path=tmp_path/"cache.json"
+    path.write_text("{not json")
+    cache=ResultCache(str(path))
+    assert cache.load()==0
+    assert not cache.dirty
+
+def test_flushKeepsPermissions(tmp_path):
+    path=tmp_path/"cache.json"
+    cache=ResultCache(str(path))
+    cache.put("H2O",{})
+    assert cache.flush()
+    #a new file gets what open() would have given it
+    umask=os.umask(0)
+    os.umask(umask)
+    assert path.stat().st_mode&0o777==0o666&~umask
+    os.chmod(path,0o640)
+    cache.put("CH4",{})
+    assert cache.flush()
+    assert path.stat().st_mode&0o777==0o640
@@ -0,0 +1,59 @@
+"""SingleFlight sharing one task between callers, and letting go of it once
+nobody waits on it"""
+import asyncio
+from singleFlight import SingleFlight
+
+
+def test_callersShareOneTask():
+    async def main():
+        flight=SingleFlight()
+        calls=[]
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "done"
+        results=await asyncio.gather(*(flight.run("H2O",work)
+                                       for _ in range(3)))
+        assert results==["done"]*3
+        assert len(calls)==1
+        assert flight.stats()=={"inFlight":0,"started":1,"shared":2}
+    asyncio.run(main())
+
+def test_oneCallerLeavingKeepsTheTask():
+    async def main():
+        flight=SingleFlight()
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+        first=asyncio.ensure_future(flight.run("H2O",work))
+        second=asyncio.ensure_future(flight.run("H2O",work))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second=="done"
+    asyncio.run(main())
+
+def test_callerAfterTheLastLeavesStartsOver():
+    """the cancelled task is still unwinding when the next caller comes"""
+    async def main():
+        flight=SingleFlight()
+        started=[]
+        async def work():
+            started.append(1)
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                #still busy for a moment after being cancelled
+                await asyncio.shield(asyncio.sleep(0.01))
+                raise
+            return "done"
+        async def quick():
+            started.append(1)
+            return "done"
+        first=asyncio.ensure_future(flight.run("H2O",work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert "H2O" not in flight
+        assert await flight.run("H2O",quick)=="done"
+        assert len(started)==2
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""getBestStructures over a corpus of small species: how many best
+structures each has and their score, and every engine finding the same
+ones"""
+import pytest
+from canonicalForm import canonicalCode, moleculeGraph
+from moleculeSolver import getBestStructures
+
+#name -> (number of best structures, their score), None for no structure.
+#the expanded octets find nothing, as they always have
+SNAPSHOT={
+    "hydrochloric acid": (1,0.0),
+    "ammonia": (1,0.0),
+    "water": (1,0.0),
+    "carbon dioxide": (1,0.0),
+    "carbon monoxide": (1,3.0),
+    "methane": (1,0.0),
+    "ethane": (1,0.0),
+    "propane": (1,0.0),
+    "butane": (2,0.0),
+    "ethene": (1,0.0),
+    "propene": (1,0.0),
+    "ethyne": (1,0.0),
+    "formaldehyde": (1,0.0),
+    "methanol": (1,0.0),
+    "ethanol": (2,0.0),
+    "ozone": (1,23.0),
+    "hydrogen": (1,0.0),
+    "nitrogen": (1,0.0),
+    "oxygen": (1,0.0),
+    "hydrogen sulfide": (1,0.0),
+    "sulfur dioxide": (1,3.0),
+    "hydrogen cyanide": (1,0.0),
+    "formic acid": (1,0.0),
+    "acetic acid": (5,0.0),
+    "nitric acid": (1,4.0),
+    "hydrogen peroxide": (1,20.0),
+    "NH4^+": (1,2.0),
+    "CO3^2-": (1,3.0),
+    "NO3^-": (1,5.0),
+    "SO4^2-": (1,7.2),
+    "BF3": (1,0.0),
+    "C3H6O": (6,0.0),
+    "OH^-": (1,2.0),
+    "N2O": (1,3.0),
+    "N2H4": (1,10.0),
+    "F2O": (1,14.0),
+    "NO2^-": (1,2.5),
+    "SCN^-": (2,2.0),
+    "PO4^3-": (1,6.0),
+    "BeCl2": (1,0.0),
+    "ClO4^-": (0,None),
+    "SF6": (0,None),
+    "PCl5": (0,None),
+    "XeF4": (0,None),
+    "ClF3": (0,None),
+    "I3^-": (0,None),
+}
+
+ENGINES={
+    "plain": {},
+    "compact": {"compact":True},
+    "trees": {"trees":True},
+    "compactTrees": {"compact":True,"trees":True},
+}
+
+
+@pytest.mark.parametrize("name",SNAPSHOT)
+def test_snapshot(name):
+    """every engine finds the structures it always has, the same ones up to
+    relabelling"""
+    ids={}
+    found={}
+    for engine,options in ENGINES.items():
+        structures=getBestStructures(name,**options)
+        score=structures[0].getScore() if structures else None
+        assert (len(structures),score)==SNAPSHOT[name],engine
+        found[engine]=sorted(canonicalCode(*moleculeGraph(structure),ids)
+                             for structure in structures)
+    assert all(codes==found["plain"] for codes in found.values())
+
+def test_oddElectrons():
+    with pytest.raises(ValueError):
+        getBestStructures("nitrogen dioxide")
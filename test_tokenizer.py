@@ -0,0 +1,45 @@
+"""cache keys: every spelling of a formula gets the same one"""
+import pytest
+from tokenizer import (formulaKey, hillFormula, keyFromUniqueString,
+                       parseComposition)
+
+
+def test_spellingsShareAKey():
+    assert formulaKey("CH3COOH")=="C2H4O2"
+    assert formulaKey("C2H4O2")=="C2H4O2"
+    assert formulaKey("acetic acid")=="C2H4O2"
+    assert formulaKey("C2H5OH")==formulaKey("C2H6O")=="C2H6O"
+    assert formulaKey("ethanol")==formulaKey("C2H6O")
+
+def test_chargeSuffix():
+    assert formulaKey("CO3^2-")=="CO3^2-"
+    assert formulaKey("NH4^+")=="H4N^+"
+    assert formulaKey("OH^-")=="HO^-"
+    assert formulaKey("CO3^2-")!=formulaKey("CO3")
+
+def test_hillOrder():
+    #carbon first, then hydrogen, then the rest alphabetically
+    assert hillFormula({"O":1,"H":4,"C":1})=="CH4O"
+    assert hillFormula({"Cl":1,"C":1,"H":3,"Br":1})=="CH3BrCl"
+    #alphabetical without carbon
+    assert hillFormula({"S":1,"O":4,"H":2})=="H2O4S"
+    assert hillFormula({"O":3,"C":1},-2)=="CO3^2-"
+
+def test_keyFromUniqueString():
+    assert keyFromUniqueString("HHHHCCOO0")=="C2H4O2"
+    assert keyFromUniqueString("HHHHN1")=="H4N^+"
+    assert keyFromUniqueString("OOOC-2")=="CO3^2-"
+    assert keyFromUniqueString("garbage") is None
+    assert keyFromUniqueString("HHO") is None
+    assert keyFromUniqueString("XxO0") is None
+
+def test_nothingToParse():
+    for name in ("","garbage","NaCl"):
+        with pytest.raises(ValueError):
+            formulaKey(name)
+
+def test_compositionIsCached():
+    assert parseComposition("CH3COOH") is parseComposition("CH3COOH")
+    composition=parseComposition("CH3COOH")
+    assert composition.counts==(("H",4),("C",2),("O",2))
+    assert sorted(composition.symbols())==sorted("HHHHCCOO")
@@ -0,0 +1,145 @@
+"""RollbackUnionFind and the connectivity kept on molecules, checked against
+walking the bonds"""
+import random
+from compactMolecule import CompactMolecule
+from tokenizer import parseMolecule
+from unionFind import RollbackUnionFind
+
+
+def walkPieces(numItems,edges):
+    """(the piece of every item, which items are in a piece with a ring) by
+    walking the edges"""
+    neighbors=[[] for _ in range(numItems)]
+    for one,two in edges:
+        neighbors[one].append(two)
+        neighbors[two].append(one)
+    piece=[-1]*numItems
+    ringed=set()
+    numPieces=0
+    for start in range(numItems):
+        if piece[start]>=0:
+            continue
+        members=[start]
+        piece[start]=numPieces
+        for item in members:
+            for other in neighbors[item]:
+                if piece[other]<0:
+                    piece[other]=numPieces
+                    members.append(other)
+        numEdges=sum(len(neighbors[item]) for item in members)//2
+        if numEdges>=len(members):
+            ringed.update(members)
+        numPieces+=1
+    return piece,ringed
+
+def checkAgainstWalk(unionFind,numItems,edges):
+    piece,ringed=walkPieces(numItems,edges)
+    numPieces=len(set(piece))
+    assert unionFind.components==numPieces
+    assert unionFind.isConnected()==(numPieces<=1)
+    for item in range(numItems):
+        assert unionFind.hasRing(item)==(item in ringed)
+
+
+def test_randomWalk():
+    """unions and rollbacks in random order, rings and repeated edges
+    included"""
+    rng=random.Random(7)
+    for numItems in (1,2,5,12):
+        unionFind=RollbackUnionFind(numItems)
+        edges=[]
+        for _ in range(2000):
+            if edges and rng.random()<0.45:
+                one,two=edges.pop()
+                if rng.random()<0.5:
+                    one,two=two,one
+                assert unionFind.rollback(one,two)
+            else:
+                one=rng.randrange(numItems)
+                two=rng.randrange(numItems)
+                piece=walkPieces(numItems,edges)[0]
+                #False exactly when the edge closes a ring
+                assert unionFind.union(one,two)==(piece[one]!=piece[two])
+                edges.append((one,two))
+            checkAgainstWalk(unionFind,numItems,edges)
+
+def test_rollbackOnlyTakesTheLastEdge():
+    unionFind=RollbackUnionFind(3)
+    unionFind.union(0,1)
+    unionFind.union(1,2)
+    assert not unionFind.rollback(0,1)
+    assert unionFind.components==1
+    assert unionFind.rollback(2,1)
+    assert unionFind.rollback(0,1)
+    assert not unionFind.rollback(0,1)
+    assert unionFind.components==3
+
+def test_copyCantTakeBackOlderEdges():
+    unionFind=RollbackUnionFind(3)
+    unionFind.union(0,1)
+    copy=unionFind.copy()
+    assert not copy.rollback(0,1)
+    copy.union(1,2)
+    assert copy.rollback(1,2)
+    assert copy.components==2
+
+
+def test_compactCopyUnBond():
+    """a copy taking back a bond from before it was copied"""
+    state=CompactMolecule(parseMolecule("C3H8"))
+    state.sigmaBond(0,1)
+    state.sigmaBond(1,2)
+    state.sigmaBond(2,0)
+    copy=state.copy()
+    assert copy.hasRing(0)
+    copy.unBond(2,0)
+    assert not copy.hasRing(0)
+    copy.unBond(1,2)
+    assert not copy.isBondedOrCircular()[0]
+    assert state.hasRing(0)
+
+def test_compactRandomWalk():
+    """sigmaBond and unBond on a CompactMolecule, copied now and then,
+    against walking its bonds"""
+    rng=random.Random(11)
+    for name in ("C4H10","C3H6O","C2H4O2","NH4^+"):
+        state=CompactMolecule(parseMolecule(name))
+        numAtoms=state.numAtoms
+        for _ in range(1000):
+            if state.bonds and rng.random()<0.45:
+                state.unBond(*state.bonds[-1])
+            else:
+                one,two=rng.sample(range(numAtoms),2)
+                state.sigmaBond(one,two)
+            if rng.random()<0.1:
+                state=state.copy()
+            piece,ringed=walkPieces(numAtoms,state.bonds)
+            assert state.isBondedOrCircular()==(len(set(piece))<=1,
+                                                0 in ringed)
+            for atom in range(numAtoms):
+                assert state.hasRing(atom)==(atom in ringed)
+
+def test_moleculeRandomWalk():
+    """Molecule's connectivity against searchBondedOrCircular"""
+    rng=random.Random(3)
+    for name in ("C4H10","C3H6O","C2H4O2","HCN"):
+        molecule=parseMolecule(name)
+        atoms=molecule.atoms
+        made=[]
+        for _ in range(1000):
+            if made and rng.random()<0.45:
+                one,two,bond=made.pop()
+                one.unBond(two,bond)
+            else:
+                one,two=rng.sample(atoms,2)
+                bond=one.sigmaBond(two)
+                if bond:
+                    made.append((one,two,bond))
+            assert (molecule.isBondedOrCircular()==
+                    molecule.searchBondedOrCircular())
+            edges=[(molecule.atomIndex[one],molecule.atomIndex[two])
+                   for one,two,_ in made]
+            ringed=walkPieces(len(atoms),edges)[1]
+            for atom in atoms:
+                assert (molecule.hasRing(atom)==
+                        (molecule.atomIndex[atom] in ringed))
@@ -1,7 +1,19 @@
 from chemistry import*
 from moleculeClass import Molecule
-def parseAtoms(name):
-    """parses all atoms in molecule"""
+from periodicTable import ELEMENTS
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+
+def checkSymbol(symbol):
+    """symbol, if it's an element Atom(symbol) would accept"""
+    if symbol not in ELEMENTS:
+        raise KeyError(symbol)
+    return symbol
+
+def parseSymbols(name):
+    """parses the symbols of all atoms in molecule, in formula order"""
     try:
         assert(isinstance(name,str))
         assert(name.count("(")==name.count(")"))
@@ -15,9 +27,9 @@ def parseAtoms(name):
                 break
             if name[index].isupper():
                 if index==len(name)-1 or (not name[index+1].islower()):
-                   atomList.append(Atom(name[index]))
+                   atomList.append(checkSymbol(name[index]))
                 else:
-                   atomList.append(Atom(name[index:index+2]))
+                   atomList.append(checkSymbol(name[index:index+2]))
             if name[index].isnumeric():
                 try:
                     if name[index-1].isnumeric() and index-1>=0:
@@ -39,9 +51,9 @@ def parseAtoms(name):
                         timesToAdd=int(name[index])-1
                 except:
                     timesToAdd=int(name[index])-1
-                prevAtom=atomList[-1].symbol
+                prevAtom=atomList[-1]
                 for _ in range(timesToAdd):
-                    atomList.append(Atom(prevAtom))
+                    atomList.append(prevAtom)
             if name[index]=="(":
                 for index2 in range(index+1,len(name)):
                     if name[index2]==")":
@@ -61,7 +73,7 @@ def parseAtoms(name):
                             timesAdded=1
                         assert(timesAdded)
                         for _ in range(timesAdded):
-                            atomList+=parseAtoms(name[index+1:index2])
+                            atomList+=parseSymbols(name[index+1:index2])
                         break
                 index=index2+1
                 continue
@@ -70,10 +82,14 @@ def parseAtoms(name):
 
     except:
         return []
+
+def parseAtoms(name):
+    """parses all atoms in molecule"""
+    return [Atom(symbol) for symbol in parseSymbols(name)]
     
 
-def parseMolecule(name):
-        commonNames={
+#names parseMolecule understands besides formulas
+commonNames={
     "hydrochloric acid": "HCl",
     "ammonia": "NH3",
     "water": "H2O",
@@ -108,11 +124,9 @@ def parseMolecule(name):
     "tartaric acid":"C4H6O6"
 
 }
-        if name in commonNames:
-            atomList=parseAtoms(commonNames[name])
-        else:
-            atomList=parseAtoms(name)
-        ###gets the charge
+
+def parseCharge(name):
+        """the charge after the ^, 0 without one"""
         if "^" in name:
             if "+"==name[-1]:
                 charge=(1 if name[-2]=="^" else int(name[-2]))
@@ -125,10 +139,84 @@ def parseMolecule(name):
             
         else:
             charge=0
-        newMolecule=Molecule(atomList,charge,name)
-        if newMolecule.numElectrons%2==1:
-           raise ValueError("Molecule has odd number of electrons")
-        return newMolecule
+        return charge
+
+
+def chargeSuffix(charge):
+    """the ^2- parseCharge reads, nothing for 0"""
+    if not charge:
+        return ""
+    return "^"+(str(abs(charge)) if abs(charge)>1 else "")+(
+        "+" if charge>0 else "-")
+
+def hillFormula(counts,charge=0):
+    """hill notation: C then H then the rest alphabetically when there's
+    carbon, everything alphabetically when there isn't"""
+    counts=dict(counts)
+    if "C" in counts:
+        order=["C"]+(["H"] if "H" in counts else [])+sorted(
+            symbol for symbol in counts if symbol not in ("C","H"))
+    else:
+        order=sorted(counts)
+    return "".join(symbol+(str(counts[symbol]) if counts[symbol]>1 else "")
+                   for symbol in order)+chargeSuffix(charge)
+
+
+@dataclass(frozen=True)
+class Composition:
+    """what a formula is made of, without building any atoms"""
+    #(symbol, count) pairs, lightest element first
+    counts: tuple
+    charge: int
+    #hill formula with the charge, the same for every spelling of it
+    key: str
+    #the molecule's uniqueString(), what keys used to be
+    uniqueString: str
+
+    def symbols(self):
+        return [symbol for symbol,count in self.counts for _ in range(count)]
+
+@lru_cache(maxsize=4096)
+def parseComposition(name):
+    """parseMolecule without the Molecule, raising the same errors. cached,
+    so parsing the same name again is a dictionary lookup"""
+    symbols=parseSymbols(commonNames.get(name,name))
+    #parseSymbols gives [] for anything it can't read, which would otherwise
+    #all share the empty key
+    if not symbols:
+        raise ValueError("no atoms in "+repr(name))
+    charge=parseCharge(name)
+    counts=tuple(sorted(Counter(symbols).items(),
+                        key=lambda item: ELEMENTS[item[0]].molarMass))
+    numElectrons=sum(ELEMENTS[symbol].valenceElectrons*count for
+                     symbol,count in counts)-charge
+    if numElectrons%2==1:
+        raise ValueError("Molecule has odd number of electrons")
+    uniqueString="".join(symbol*count for symbol,count in counts)+str(charge)
+    return Composition(counts,charge,hillFormula(counts,charge),uniqueString)
+
+def formulaKey(name):
+    """the key results are cached under, "C2H4O2" for acetic acid,
+    CH3COOH and C2H4O2 alike, "CO3^2-" for carbonate"""
+    return parseComposition(name).key
+
+def keyFromUniqueString(uniqueString):
+    """formulaKey for a uniqueString() key, like "HHHHCCOO0", from before
+    results were keyed by hill formula. None if it isn't one"""
+    match=re.fullmatch(r"((?:[A-Z][a-z]?)*)(-?\d+)",uniqueString)
+    if not match:
+        return None
+    symbols=re.findall(r"[A-Z][a-z]?",match.group(1))
+    if any(symbol not in ELEMENTS for symbol in symbols):
+        return None
+    return hillFormula(Counter(symbols),int(match.group(2)))
+
+def parseMolecule(name):
+        composition=parseComposition(name)
+        #atoms of one element are interchangeable, so this is the molecule
+        #the formula order would have given
+        atomList=[Atom(symbol) for symbol in composition.symbols()]
+        return Molecule(atomList,composition.charge,name)
     
 
 
@@ -0,0 +1,185 @@
+"""lays a tree shaped molecule out on the 65 unit grid without backtracking,
+instead of trying every direction like recursiveAssignPositions.
+
+every bond takes one of the four grid points next to the atom it hangs
+from, a long bond (two steps) takes it as its midpoint. a bond of one step
+can't cross another one and a long one can only cross at its midpoint, so
+the only thing to check is that no two atoms or midpoints share a point.
+
+atoms are placed one at a time, in one pass. hydrogens go as soon as their
+atom is placed, on the side nearest the atoms already there. other atoms go
+biggest subtree first (the order recursiveAssignPositions sorts them in,
+with the sizes worked out once instead of by a BFS per atom per step), on
+the side furthest from the atoms already there. a spot is only taken if
+every atom next to it still has a free side for each atom waiting to hang
+from it.
+
+that pass is tried compact (short bonds first) and then spread out (long
+bonds first where they're allowed), from every heavy atom as the root, so a
+molecule is at worst laid out once per heavy atom. the few it still gets
+stuck on, and molecules that aren't trees, are left to
+recursiveAssignPositions"""
+from heapq import heappush, heappop
+from chemistry import Bond
+
+STEP=65
+#the directions recursiveAssignPositions tries, in its order
+DIRECTIONS=((-1,0),(1,0),(0,-1),(0,1))
+
+
+def treeNeighbors(molecule):
+    """the atom indices bonded to each atom, None if the bonds don't make
+    one tree"""
+    atoms=molecule.atoms
+    index={atom:position for position,atom in enumerate(atoms)}
+    neighbors=[[index[domain.getOther(atom)] for domain in atom.electronDomains
+                if isinstance(domain,Bond)] for atom in atoms]
+    if sum(map(len,neighbors))!=2*(len(atoms)-1):
+        return None
+    return neighbors
+
+def rootedTree(neighbors,root):
+    """parent, children and subtree size of every atom, None if not every
+    atom hangs from root"""
+    numAtoms=len(neighbors)
+    parent=[-1]*numAtoms
+    children=[[] for _ in range(numAtoms)]
+    order=[root]
+    seen={root}
+    for atom in order:
+        for other in neighbors[atom]:
+            if other not in seen:
+                seen.add(other)
+                parent[other]=atom
+                children[atom].append(other)
+                order.append(other)
+    if len(order)!=numAtoms:
+        return None
+    size=[1]*numAtoms
+    for atom in reversed(order[1:]):
+        size[parent[atom]]+=size[atom]
+    return parent,children,size
+
+def canBeLong(atomOne,atomTwo):
+    """recursiveAssignPositions' rule for long bonds"""
+    return ((len(atomOne.surroundingSet)>=3 or len(atomTwo.surroundingSet)>=3)
+            and atomOne.symbol!="H" and atomTwo.symbol!="H")
+
+
+def placeTree(atoms,tree,root,spread):
+    """grid points (root at 0,0) and long flags for every atom, None if
+    the pass gets stuck"""
+    parent,children,size=tree
+    numAtoms=len(atoms)
+    #grid point -> the atom there, or -1 for a long bond's midpoint
+    taken={(0,0):root}
+    spots=[None]*numAtoms
+    spots[root]=(0,0)
+    long=[False]*numAtoms
+    #children each placed atom still has to find a spot for
+    waiting=[len(children[atom]) for atom in range(numAtoms)]
+    def freeSides(atom,blocked):
+        atomX,atomY=spots[atom]
+        return sum((atomX+dx,atomY+dy) not in taken and
+                   (atomX+dx,atomY+dy) not in blocked for dx,dy in DIRECTIONS)
+    def leavesRoom(atom,parentAtom,spot,middle):
+        """whether every placed atom next to the new points still has a
+        free side for each child it's waiting on, and the new atom has too"""
+        blocked=(spot,middle)
+        for pointX,pointY in blocked:
+            for dx,dy in DIRECTIONS:
+                other=taken.get((pointX+dx,pointY+dy),-1)
+                if other<0:
+                    continue
+                if freeSides(other,blocked)<waiting[other]-(other==parentAtom):
+                    return False
+        spotX,spotY=spot
+        return sum((spotX+dx,spotY+dy) not in taken and
+                   (spotX+dx,spotY+dy)!=middle
+                   for dx,dy in DIRECTIONS)>=waiting[atom]
+    def push(atom):
+        for child in children[atom]:
+            heappush(frontier,(-numAtoms-1 if atoms[child].symbol=="H"
+                               else -size[child],child))
+    #the placed atoms' center, hydrogens go near it and the rest away
+    sumX=sumY=0
+    placed=1
+    frontier=[]
+    push(root)
+    while frontier:
+        _,atom=heappop(frontier)
+        parentAtom=parent[atom]
+        parentX,parentY=spots[parentAtom]
+        centerX=sumX/placed
+        centerY=sumY/placed
+        away=-1 if atoms[atom].symbol=="H" else 1
+        if canBeLong(atoms[atom],atoms[parentAtom]):
+            lengths=(2,1) if spread else (1,2)
+        else:
+            lengths=(1,)
+        best=None
+        for length in lengths:
+            for dx,dy in DIRECTIONS:
+                spot=(parentX+length*dx,parentY+length*dy)
+                middle=(parentX+dx,parentY+dy)
+                if spot in taken or middle in taken:
+                    continue
+                distance=away*((spot[0]-centerX)**2+(spot[1]-centerY)**2)
+                if best is not None and distance<=best[0]:
+                    continue
+                if leavesRoom(atom,parentAtom,spot,middle):
+                    best=(distance,spot,middle)
+            if best is not None:
+                break
+        if best is None:
+            return None
+        _,spot,middle=best
+        if spot!=middle:
+            taken[middle]=-1
+            long[atom]=True
+        taken[spot]=atom
+        spots[atom]=spot
+        waiting[parentAtom]-=1
+        sumX+=spot[0]
+        sumY+=spot[1]
+        placed+=1
+        push(atom)
+    return spots,long
+
+def layOutTree(molecule,x=500,y=300,stats=None):
+    """gives every atom a position, the root of the layout that worked at
+    x,y. returns False, changing nothing, if it can't"""
+    atoms=molecule.atoms
+    if not atoms:
+        return True
+    neighbors=treeNeighbors(molecule)
+    if neighbors is None:
+        return False
+    roots=[atom for atom in range(len(atoms))
+           if atom==0 or atoms[atom].symbol!="H"]
+    for spread in (False,True):
+        for root in roots:
+            tree=rootedTree(neighbors,root)
+            if tree is None:
+                return False
+            placement=placeTree(atoms,tree,root,spread)
+            if placement is None:
+                if stats is not None:
+                    stats.count("layout.tree.retries")
+                continue
+            spots,long=placement
+            parent=tree[0]
+            for atom,atomObject in enumerate(atoms):
+                atomObject.centerX=x+STEP*spots[atom][0]
+                atomObject.centerY=y+STEP*spots[atom][1]
+                if atom==root:
+                    atomObject.predecessor=None
+                    continue
+                atomObject.predecessor=atoms[parent[atom]]
+                atomObject.getBond(atoms[parent[atom]]).isLong=long[atom]
+            if stats is not None:
+                stats.count("layout.tree")
+            return True
+    if stats is not None:
+        stats.count("layout.tree.stuck")
+    return False
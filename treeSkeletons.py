@@ -0,0 +1,317 @@
+"""skeletal structures straight from the trees they are, instead of trying
+every pair of atoms like iterSkeletalStructuresDFS does.
+
+trees are grown one atom at a time by canonical augmentation: an atom is
+only hung onto one atom of each automorphism orbit, and the bigger tree is
+only kept if the new atom is the leaf canonicalLeaves would take off again.
+that way every tree, up to isomorphism, is made exactly once, and rings are
+never built. only heavy atoms are grown like that. hydrogens can only ever
+be leaves, so they're just a count per heavy atom until the heavy atoms are
+all in. then every way of sharing them out is tried and the ones that give
+the same tree are dropped (treeCode).
+
+a skeleton is only a list of bonds until it's handed out, and then it's
+built in one go, as a Molecule (buildMolecule) or, without making any
+Atoms, as a CompactMolecule (CompactMolecule.withSkeleton)
+
+the DFS's pruning rules are kept as the tree grows: no atom gets more bonds
+than it takes (maxDegree), and no O-O bonds. badCarbon needs the whole
+tree, so it's checked on finished ones"""
+from collections import Counter
+from chemistry import Atom, Bond
+from moleculeClass import Molecule
+from compactMolecule import CompactMolecule, getBondOrder
+from helperFunctions import checkOverBonding
+from backtracker import iterSkeletalStructuresDFS, iterCompactSkeletons
+
+
+def maxDegree(symbol):
+    """how many single bonds the DFS lets an atom of symbol make"""
+    center=Atom(symbol)
+    degree=0
+    while degree<8:
+        if center.electronDomains and checkOverBonding(center):
+            break
+        if not center.sigmaBond(Atom("C")) or center.hasOctet()==False:
+            break
+        degree+=1
+    return degree
+
+def rootedCode(adjacency,labels,root):
+    """canonical string of the tree hanging from root. two atoms are in the
+    same orbit exactly when their codes match"""
+    parent={root:-1}
+    order=[]
+    stack=[root]
+    while stack:
+        current=stack.pop()
+        order.append(current)
+        for other in adjacency[current]:
+            if other!=parent[current]:
+                parent[other]=current
+                stack.append(other)
+    codes={}
+    for current in reversed(order):
+        codes[current]="("+labels[current]+"".join(sorted(
+            codes[other] for other in adjacency[current]
+            if other!=parent[current]))+")"
+    return codes[root]
+
+def treeCode(adjacency,labels):
+    """canonical string of the whole tree, the same for isomorphic ones"""
+    return min(rootedCode(adjacency,labels,root) for root in
+               range(len(labels)))
+
+def skeletonBondOrder(molecule,bonds):
+    """the order the skeleton DFS's clones list bonds in, getBondList's
+    order for atoms that got their bonds in the order of bonds"""
+    prefBonds=[atom.prefBonds for atom in molecule.atoms]
+    return sorted(getBondOrder(bonds,molecule.numAtoms),
+                  key=lambda bond: min(prefBonds[bond[0]],prefBonds[bond[1]]),
+                  reverse=True)
+
+def buildMolecule(molecule,bonds):
+    """the skeleton with bonds, pairs of indices into molecule.atoms, as
+    the molecule the skeleton DFS would have made for it"""
+    atomList=[]
+    for atom in molecule.atoms:
+        newAtom=Atom(atom.symbol)
+        newAtom.canExpandOctet=atom.canExpandOctet
+        atomList.append(newAtom)
+    for one,two in skeletonBondOrder(molecule,bonds):
+        atomOne=atomList[one]
+        atomTwo=atomList[two]
+        newBond=Bond("-",atomOne,atomTwo)
+        atomOne.electronDomains.append(newBond)
+        atomTwo.electronDomains.append(newBond)
+        atomOne.currentElectrons+=2
+        atomTwo.currentElectrons+=2
+    skeleton=Molecule(atomList,molecule.charge,molecule.formula)
+    skeleton.formalChargeSum=molecule.formalChargeSum
+    skeleton.expandedOctet=molecule.expandedOctet
+    skeleton.currentElectrons=molecule.currentElectrons+2*len(bonds)
+    skeleton.bondElectrons=skeleton.currentElectrons
+    return skeleton
+
+def canonicalLeaves(adjacency,labels):
+    """the leaves canonical augmentation takes off: hydrogens while there
+    are any, otherwise any leaf, narrowed down to the orbit with the
+    biggest code"""
+    leaves=[atom for atom in range(len(labels)) if len(adjacency[atom])<=1]
+    hydrogens=[atom for atom in leaves if labels[atom]=="H"]
+    if hydrogens:
+        leaves=hydrogens
+    codes={atom:rootedCode(adjacency,labels,atom) for atom in leaves}
+    best=max(codes.values())
+    return {atom for atom,code in codes.items() if code==best}
+
+
+class TreeSearch:
+    """one run of iterTreeSkeletons"""
+
+    def __init__(self,molecule,budget=None,stats=None):
+        self.molecule=molecule
+        self.budget=budget
+        self.stats=stats
+        self.numAtoms=molecule.numAtoms
+        self.remaining=Counter(atom.symbol for atom in molecule.atoms)
+        #which atom of the molecule each tree atom of a symbol becomes
+        self.atomsBySymbol={}
+        for index,atom in enumerate(molecule.atoms):
+            self.atomsBySymbol.setdefault(atom.symbol,[]).append(index)
+        self.caps={symbol:maxDegree(symbol) for symbol in self.remaining}
+        #heavy atoms first, the way the molecule orders them
+        self.symbols=[]
+        for atom in molecule.atoms:
+            if atom.symbol not in self.symbols and atom.symbol!="H":
+                self.symbols.append(atom.symbol)
+        self.labels=[]
+        self.adjacency=[]
+        self.edges=[]
+        self.found=[]
+
+    def count(self,name):
+        if self.stats is not None:
+            self.stats.count(name)
+
+    def canFinish(self):
+        """whether the atoms left could still all be hung onto the tree"""
+        left=sum(self.remaining.values())
+        if not left:
+            return True
+        caps=self.caps
+        free=sum(caps[self.labels[atom]]-len(self.adjacency[atom])
+                 for atom in range(len(self.labels)))
+        #every atom still to come takes one free bond and brings cap-1
+        later=sum((caps[symbol]-1)*number for symbol,number in
+                  self.remaining.items())
+        return free>0 and free+later>=left
+
+    def addAtom(self,symbol,parent):
+        atom=len(self.labels)
+        self.labels.append(symbol)
+        self.adjacency.append([])
+        self.remaining[symbol]-=1
+        if parent is not None:
+            self.adjacency[atom].append(parent)
+            self.adjacency[parent].append(atom)
+            self.edges.append((parent,atom))
+        return atom
+
+    def removeAtom(self,parent):
+        symbol=self.labels.pop()
+        self.adjacency.pop()
+        self.remaining[symbol]+=1
+        if parent is not None:
+            self.adjacency[parent].pop()
+            self.edges.pop()
+
+    def run(self):
+        for symbol in self.symbols or ["H"]:
+            self.addAtom(symbol,None)
+            yield from self.grow()
+            self.removeAtom(None)
+
+    def spend(self):
+        budget=self.budget
+        return not (budget is not None and not budget.spend() and
+                    budget.shouldStop(self.found))
+
+    def stopping(self):
+        budget=self.budget
+        return budget is not None and budget.shouldStop(self.found)
+
+    def grow(self):
+        if not self.spend():
+            return
+        self.count("tree.nodes")
+        if not self.canFinish():
+            self.count("tree.prune.capacity")
+            return
+        labels=self.labels
+        adjacency=self.adjacency
+        heavyLeft=any(self.remaining[symbol] for symbol in self.symbols)
+        if self.symbols and not heavyLeft:
+            yield from self.addHydrogens()
+            return
+        if len(labels)==self.numAtoms:
+            #only hydrogens, H2
+            yield from self.finish(labels,self.edges)
+            return
+        #one atom per orbit that can still take a bond
+        orbits={}
+        for atom in range(len(labels)):
+            if len(adjacency[atom])<self.caps[labels[atom]]:
+                orbits.setdefault(rootedCode(adjacency,labels,atom),atom)
+        parents=sorted(orbits.values())
+        for symbol in (self.symbols if heavyLeft else ["H"]):
+            if not self.remaining[symbol]:
+                continue
+            for parent in parents:
+                if self.stopping():
+                    return
+                #eliminates peroxides
+                if symbol=="O" and labels[parent]=="O":
+                    continue
+                atom=self.addAtom(symbol,parent)
+                if atom in canonicalLeaves(adjacency,labels):
+                    yield from self.grow()
+                else:
+                    self.count("tree.prune.notCanonical")
+                self.removeAtom(parent)
+
+    def addHydrogens(self):
+        """every way of sharing the hydrogens out over the finished heavy
+        atoms, one skeleton per tree it makes"""
+        labels=self.labels
+        adjacency=self.adjacency
+        numHeavy=len(labels)
+        free=[self.caps[labels[atom]]-len(adjacency[atom])
+              for atom in range(numHeavy)]
+        #how many hydrogens the atoms from index on can still take
+        freeAfter=[0]*(numHeavy+1)
+        for atom in range(numHeavy-1,-1,-1):
+            freeAfter[atom]=freeAfter[atom+1]+free[atom]
+        hydrogens=[0]*numHeavy
+        seen=set()
+        def place(atom,left):
+            if atom==numHeavy:
+                if not self.spend():
+                    return
+                #the heavy tree with each atom's hydrogens in its label
+                code=treeCode(adjacency,[labels[heavy]+"H"*hydrogens[heavy]
+                                         for heavy in range(numHeavy)])
+                if code in seen:
+                    self.count("tree.prune.duplicate")
+                    return
+                seen.add(code)
+                allLabels=labels[:]
+                edges=self.edges[:]
+                for heavy in range(numHeavy):
+                    for _ in range(hydrogens[heavy]):
+                        edges.append((heavy,len(allLabels)))
+                        allLabels.append("H")
+                yield from self.finish(allLabels,edges)
+                return
+            for number in range(max(0,left-freeAfter[atom+1]),
+                                min(free[atom],left)+1):
+                if self.stopping():
+                    return
+                hydrogens[atom]=number
+                yield from place(atom+1,left-number)
+            hydrogens[atom]=0
+        yield from place(0,self.remaining["H"])
+
+    def finish(self,labels,edges):
+        """yields the skeleton unless it has a bad carbon"""
+        degrees=Counter()
+        for one,two in edges:
+            degrees[one]+=1
+            degrees[two]+=1
+        if any(labels[atom]=="C" and degrees[atom]<2
+               for atom in range(len(labels))):
+            self.count("tree.prune.badCarbon")
+            return
+        taken=Counter()
+        indices=[]
+        for symbol in labels:
+            indices.append(self.atomsBySymbol[symbol][taken[symbol]])
+            taken[symbol]+=1
+        bonds=[(indices[one],indices[two]) for one,two in edges]
+        self.found.append(bonds)
+        self.count("tree.skeletons")
+        yield bonds
+
+
+def iterTreeSkeletons(molecule,budget=None,stats=None):
+    """yields every skeletal structure iterSkeletalStructuresDFS would,
+    each isomer once. the DFS lets its first skeleton break the pruning
+    rules, so molecules with no skeleton that keeps them (O2, H2O2) are
+    left to the DFS"""
+    search=TreeSearch(molecule,budget,stats)
+    if not molecule.expandedOctet and molecule.numAtoms:
+        for bonds in search.run():
+            yield buildMolecule(molecule,bonds)
+    if needsFallback(search,budget,stats):
+        yield from iterSkeletalStructuresDFS(molecule,budget=budget,
+                                             stats=stats)
+
+def iterCompactTreeSkeletons(molecule,budget=None,stats=None):
+    """iterTreeSkeletons as CompactMolecule states, the same ones
+    CompactMolecule(skeleton) would give, without building any Atoms"""
+    search=TreeSearch(molecule,budget,stats)
+    if not molecule.expandedOctet and molecule.numAtoms:
+        template=CompactMolecule(molecule)
+        for bonds in search.run():
+            yield template.withSkeleton(bonds)
+    if needsFallback(search,budget,stats):
+        yield from iterCompactSkeletons(CompactMolecule(molecule),
+                                        budget=budget,stats=stats)
+
+def needsFallback(search,budget,stats):
+    """nothing found, and the budget lets the DFS look"""
+    if search.found or (budget is not None and budget.shouldStop([])):
+        return False
+    if stats is not None:
+        stats.count("tree.fallback")
+    return True
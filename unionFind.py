@@ -0,0 +1,78 @@
+"""union find over atom indices that can take back its latest unions, so
+the skeleton searches know if a structure is connected or has a ring
+without walking it"""
+
+
+class RollbackUnionFind:
+    """union by size without path compression, so every union can be undone
+    in O(1) by popping the history. finds are O(log n).
+
+    cycles[root] counts the edges of that root's piece that closed a ring"""
+    __slots__ = ["parent", "size", "cycles", "components", "history"]
+    def __init__(self,numItems=0):
+        self.parent=list(range(numItems))
+        self.size=[1]*numItems
+        self.cycles=[0]*numItems
+        self.components=numItems
+        #(one, two, root, merged root or -1 for a ring edge) per union
+        self.history=[]
+
+    def copy(self):
+        """a copy without history, it can only undo its own unions"""
+        new=RollbackUnionFind()
+        new.parent=self.parent[:]
+        new.size=self.size[:]
+        new.cycles=self.cycles[:]
+        new.components=self.components
+        return new
+
+    def find(self,item):
+        parent=self.parent
+        while parent[item]!=item:
+            item=parent[item]
+        return item
+
+    def union(self,one,two):
+        """adds the edge one-two, returns False if it closed a ring"""
+        rootOne=self.find(one)
+        rootTwo=self.find(two)
+        if rootOne==rootTwo:
+            self.cycles[rootOne]+=1
+            self.history.append((one,two,rootOne,-1))
+            return False
+        size=self.size
+        if size[rootOne]<size[rootTwo]:
+            rootOne,rootTwo=rootTwo,rootOne
+        self.parent[rootTwo]=rootOne
+        size[rootOne]+=size[rootTwo]
+        self.cycles[rootOne]+=self.cycles[rootTwo]
+        self.components-=1
+        self.history.append((one,two,rootOne,rootTwo))
+        return True
+
+    def rollback(self,one,two):
+        """takes back the edge one-two, which has to be the last one added.
+        returns False, changing nothing, if it isn't"""
+        history=self.history
+        if not history:
+            return False
+        lastOne,lastTwo,root,merged=history[-1]
+        if not ((lastOne==one and lastTwo==two) or
+                (lastOne==two and lastTwo==one)):
+            return False
+        history.pop()
+        if merged<0:
+            self.cycles[root]-=1
+            return True
+        self.parent[merged]=merged
+        self.size[root]-=self.size[merged]
+        self.cycles[root]-=self.cycles[merged]
+        self.components+=1
+        return True
+
+    def isConnected(self):
+        return self.components<=1
+
+    def hasRing(self,item):
+        """whether item's piece has a ring"""
+        return self.cycles[self.find(item)]>0